@@ -0,0 +1,61 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from utils.payload import bytes_to_bits, bits_to_bytes
+
+# Per-megabyte cost of the '0'/'1' string payload representation versus np.uint8 bit arrays.
+# Run from the repository root: python -m benchmarks.bench_payload
+
+
+def legacy_text_to_binary(text):
+    return ''.join(format(ord(char), '08b') for char in text)
+
+def legacy_binary_to_text(binary):
+    bytes_data = bytearray()
+    for i in range(0, len(binary), 8):
+        bytes_data.append(int(binary[i:i+8], 2))
+    return bytes_data
+
+def legacy_embed(carrier, binary):
+    for idx in range(len(binary)):
+        carrier[idx] = carrier[idx] & 0xFE |int(binary[idx])
+
+def array_embed(carrier, bits):
+    carrier[:len(bits)] = (carrier[:len(bits)] & 0xFE) | bits
+
+def best_of(repeat, function, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark payload bit representations")
+    parser.add_argument("--size-kb", type=int, default=256, help="Payload size in KiB")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_kb * 1024)
+    text = payload.decode('latin-1')
+    binary = legacy_text_to_binary(text)
+    bits = bytes_to_bits(payload)
+    carrier = np.random.default_rng(0).integers(0, 256, len(bits), dtype=np.uint8)
+    per_mb = 1024 / args.size_kb
+
+    rows = [
+        ("encode", best_of(args.repeat, legacy_text_to_binary, text), best_of(args.repeat, bytes_to_bits, payload)),
+        ("decode", best_of(args.repeat, legacy_binary_to_text, binary), best_of(args.repeat, bits_to_bytes, bits)),
+        ("embed", best_of(args.repeat, legacy_embed, carrier.copy(), binary), best_of(args.repeat, array_embed, carrier.copy(), bits)),
+    ]
+
+    print(f"{'stage':<8}{'string s/MB':>14}{'array s/MB':>14}{'speedup':>10}")
+    for stage, legacy_seconds, array_seconds in rows:
+        print(f"{stage:<8}{legacy_seconds * per_mb:>14.4f}{array_seconds * per_mb:>14.6f}{legacy_seconds / array_seconds:>9.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Cold-start cost of the CLI and of each registered method, measured with `python -X importtime`
+# in fresh interpreters. Which backends each scenario may import is checked by tests/test_startup.py.
+# Run from the repository root: python -m benchmarks.bench_startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('cv2', 'scipy', 'PIL', 'cryptography', 'imageio_ffmpeg', 'numpy')
+
+# (name, code)
+SCENARIOS = [
+    ("cli --help", "import sys, main; sys.argv = ['main.py', '--help']\ntry:\n    main.main()\nexcept SystemExit:\n    pass"),
+    ("image lsb", "from stego.registry import get_method; get_method('image', 'lsb').load('hide')"),
+    ("image dct", "from stego.registry import get_method; get_method('image', 'dct').load('hide')"),
+    ("audio lsb", "from stego.registry import get_method; get_method('audio', 'lsb').load('hide')"),
+    ("audio echo", "from stego.registry import get_method; get_method('audio', 'echo').load('hide')"),
+    ("video lsb", "from stego.registry import get_method; get_method('video', 'lsb').load('hide')"),
+    # What main.py imported before the registry: every engine and all of their backends.
+    ("all engines (eager)", "import stego.image_stego, stego.audio_stego, stego.video_stego, cv2, scipy.fft, scipy.io.wavfile"),
+]
+
+
+def run_importtime(code):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    import_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        import_us += int(self_us)
+        modules.add(name.strip().split('.')[0])
+    return wall, import_us / 1e6, modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI and engine import times")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<22}{'wall ms':>9}{'import ms':>11}  backends")
+    for name, code in SCENARIOS:
+        runs = [run_importtime(code) for _ in range(args.repeat)]
+        wall = min(run[0] for run in runs)
+        import_seconds = min(run[1] for run in runs)
+        modules = runs[0][2]
+        loaded = [module for module in HEAVY_MODULES if module in modules]
+        print(f"{name:<22}{wall * 1000:>9.1f}{import_seconds * 1000:>11.1f}  {', '.join(loaded) or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import argparse
+import base64
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from utils.profiling import peak_rss_mb
+
+# Times hide and extract for every method over synthetic carriers and payload sizes.
+# Carriers are generated deterministically and offline; each case runs in a fresh process so
+# its peak RSS is its own. Results are written as JSON and can be compared against a baseline:
+#   python -m benchmarks.bench_suite --output bench.json
+#   python -m benchmarks.bench_suite --output new.json --baseline bench.json   # exits 1 on regressions
+
+KIB = 1024
+
+PRESETS = {
+    'quick': {
+        'images': [('256', 256, 256), ('1024', 1024, 1024)],
+        'wavs': [('8bit-mono-5s', 1, 1, 5), ('16bit-stereo-5s', 2, 2, 5), ('16bit-mono-60s', 2, 1, 60)],
+        'videos': [('320x240-30f', 320, 240, 30)],
+        # Echo hiding carries 10 bits per second, so only the smallest payload fits its carriers.
+        'payloads': [16, KIB, 16 * KIB],
+    },
+    'full': {
+        'images': [('256', 256, 256), ('1024', 1024, 1024), ('4k', 3840, 2160), ('8k', 7680, 4320)],
+        'wavs': [('8bit-mono-5s', 1, 1, 5), ('16bit-stereo-5s', 2, 2, 5), ('16bit-mono-60s', 2, 1, 60),
+                 ('8bit-mono-1h', 1, 1, 3600), ('16bit-stereo-1h', 2, 2, 3600)],
+        'videos': [('320x240-60f', 320, 240, 60), ('1280x720-60f', 1280, 720, 60)],
+        'payloads': [16, KIB, 16 * KIB, 256 * KIB, 1024 * KIB],
+    },
+}
+
+# (file_type, method, extract/hide keyword arguments)
+METHODS = {
+    'image': [('lsb', {}), ('lsb', {'scatter': True}), ('dct', {}), ('dct', {'scatter': True})],
+    'audio': [('lsb', {'mode': 'memory'}), ('lsb', {'mode': 'stream'}), ('lsb', {'mode': 'mmap'}),
+              ('lsb', {'mode': 'memory', 'scatter': True}), ('lsb', {'mode': 'stream', 'scatter': True}), ('echo', {})],
+    'video': [('lsb', {})],
+}
+
+COMPARED_METRICS = ('hide_seconds', 'extract_seconds', 'peak_rss_mb')
+
+
+def make_image(path, width, height):
+    from PIL import Image
+    rng = np.random.default_rng(width * 7919 + height)
+    y, x = np.mgrid[0:height, 0:width]
+    base = (x * 255 // max(width - 1, 1) + y * 255 // max(height - 1, 1)) // 2
+    pixels = np.clip(base[..., None] + rng.integers(-24, 25, (height, width, 3)), 0, 255).astype(np.uint8)
+    if path.endswith('.jpg'):
+        Image.fromarray(pixels).save(path, 'JPEG', quality=90)
+    else:
+        Image.fromarray(pixels).save(path, 'PNG', compress_level=1)
+
+def make_wav(path, sample_width, channels, seconds, rate=44100):
+    import wave
+    rng = np.random.default_rng(sample_width * 1000 + channels * 100 + seconds)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(rate)
+        # Write in one-minute blocks so hour-long carriers never sit in memory.
+        for start in range(0, seconds * rate, 60 * rate):
+            frames = min(60 * rate, seconds * rate - start)
+            t = (start + np.arange(frames)) / rate
+            signal = 0.3 * np.sin(2 * np.pi * 440 * t)[:, None] + 0.1 * rng.standard_normal((frames, channels))
+            signal = np.clip(signal, -1, 1)
+            if sample_width == 1:
+                samples = (signal * 127 + 128).astype(np.uint8)
+            else:
+                samples = (signal * 32767).astype(np.int16)
+            wav.writeframes(samples.tobytes())
+
+def make_video(path, width, height, frames):
+    import cv2
+    rng = np.random.default_rng(width + height + frames)
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'FFV1'), 30, (width, height))
+    base = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    for index in range(frames):
+        out.write(np.roll(base, index * 4, axis=1))
+    out.release()
+
+def build_carriers(preset, carrier_dir):
+    # Returns (file_type, carrier name, path, carrier units, unit name); existing files are reused.
+    carriers = []
+    for name, width, height in preset['images']:
+        for extension in ('png', 'jpg'):
+            path = os.path.join(carrier_dir, f'image-{name}.{extension}')
+            if not os.path.exists(path):
+                make_image(path, width, height)
+            carriers.append(('image', f'{extension}-{name}', path, width * height / 1e6, 'megapixels'))
+    for name, sample_width, channels, seconds in preset['wavs']:
+        path = os.path.join(carrier_dir, f'audio-{name}.wav')
+        if not os.path.exists(path):
+            make_wav(path, sample_width, channels, seconds)
+        carriers.append(('audio', name, path, 44100 * seconds * channels, 'samples'))
+    for name, width, height, frames in preset['videos']:
+        path = os.path.join(carrier_dir, f'video-{name}.avi')
+        if not os.path.exists(path):
+            make_video(path, width, height, frames)
+        carriers.append(('video', name, path, frames, 'frames'))
+    return carriers
+
+def payload_message(size):
+    # Incompressible printable text, so payload sizes mean what they say.
+    return base64.b64encode(np.random.default_rng(size).bytes(size)).decode()[:size]
+
+def run_case(case):
+    # Runs in a fresh process: hide, extract and check one payload in one carrier.
+    from stego.registry import get_method
+
+    method = get_method(case['file_type'], case['method'])
+    hide, extract = method.load('hide'), method.load('extract')
+    message = payload_message(case['payload_bytes'])
+    output_path = os.path.join(case['work_dir'], case['name'].replace('/', '_') + case['output_extension'])
+
+    hide_seconds, extract_seconds, extracted = [], [], None
+    with redirect_stdout(io.StringIO()):
+        for _ in range(case['repeat']):
+            started = time.perf_counter()
+            hide(case['path'], message, 'benchmark', output_path, compression='none', **case['options'])
+            hide_seconds.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            extracted = extract(output_path, 'benchmark', **case['options'])
+            extract_seconds.append(time.perf_counter() - started)
+
+    os.remove(output_path)
+    return {'hide_seconds': min(hide_seconds), 'extract_seconds': min(extract_seconds),
+            'peak_rss_mb': peak_rss_mb(), 'ok': extracted == message}
+
+def plan_cases(carriers, payloads, repeat, work_dir):
+    from stego.capacity import carrier_capacity
+
+    cases = []
+    for file_type, carrier_name, path, units, unit in carriers:
+        for method, options in METHODS[file_type]:
+            try:
+                capacity = carrier_capacity(path, file_type, method)['max_message_bytes']
+            except Exception:
+                continue
+            label = method + ''.join(f'-{name}' if value is True else f'-{value}' for name, value in options.items())
+            for size in payloads:
+                if size > capacity:
+                    continue
+                cases.append({
+                    'name': f'{file_type}-{label}/{carrier_name}/{size}B', 'file_type': file_type,
+                    'method': method, 'options': options, 'carrier': carrier_name, 'path': path,
+                    'payload_bytes': size, 'carrier_units': units, 'unit': unit, 'repeat': repeat,
+                    'work_dir': work_dir, 'output_extension': {'image': '.png', 'audio': '.wav', 'video': '.avi'}[file_type],
+                })
+    return cases
+
+def compare(results, baseline, tolerance, min_seconds):
+    # A metric regresses when it grows by more than `tolerance` (and, for times, by more than `min_seconds`).
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(result['name'])
+        if old is None or 'error' in result or 'error' in old:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = old.get(metric), result.get(metric)
+            if before is None or after is None:
+                continue
+            floor = min_seconds if metric.endswith('seconds') else 0
+            if after > before * (1 + tolerance) and after - before > floor:
+                regressions.append(f"{result['name']}: {metric} {before:.4g} -> {after:.4g} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hide/extract across carriers, methods and payload sizes")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of repetitions per case")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--carrier-dir", help="Keep generated carriers here and reuse them across runs")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous results file and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (default: 0.25)")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="Ignore time differences below this")
+    args = parser.parse_args()
+
+    preset = PRESETS[args.preset]
+    carrier_dir = args.carrier_dir or tempfile.mkdtemp(prefix='stego_bench_carriers_')
+    os.makedirs(carrier_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='stego_bench_')
+
+    try:
+        carriers = build_carriers(preset, carrier_dir)
+        cases = [case for case in plan_cases(carriers, preset['payloads'], args.repeat, work_dir) if args.filter in case['name']]
+
+        results = []
+        # One process per case: the spawn start method and maxtasksperchild=1 give each its own peak RSS.
+        context = multiprocessing.get_context('spawn')
+        print(f"{'case':<48}{'hide s':>9}{'extract s':>11}{'Mbit/s':>9}{'units/s':>12}{'RSS MB':>9}")
+        for case in cases:
+            result = {key: case[key] for key in ('name', 'file_type', 'method', 'carrier', 'payload_bytes', 'unit')}
+            result['options'] = case['options']
+            try:
+                with context.Pool(1, maxtasksperchild=1) as pool:
+                    result.update(pool.apply(run_case, (case,)))
+                embedded_bits = case['payload_bytes'] * 8
+                result['payload_bits_per_second'] = embedded_bits / result['hide_seconds']
+                result['carrier_units_per_second'] = case['carrier_units'] / result['hide_seconds']
+                print(f"{case['name']:<48}{result['hide_seconds']:>9.4f}{result['extract_seconds']:>11.4f}"
+                      f"{result['payload_bits_per_second'] / 1e6:>9.2f}{result['carrier_units_per_second']:>12.4g}"
+                      f"{result['peak_rss_mb']:>9.1f}{'' if result['ok'] else '  MISMATCH'}")
+            except Exception as e:
+                result['error'] = f"{type(e).__name__}: {e}"
+                print(f"{case['name']:<48}  error: {result['error']}")
+            results.append(result)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if not args.carrier_dir:
+            shutil.rmtree(carrier_dir, ignore_errors=True)
+
+    report = {
+        'meta': {'preset': args.preset, 'repeat': args.repeat, 'python': platform.python_version(),
+                 'numpy': np.__version__, 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_seconds)
+        if regressions:
+            print("\nRegressions:\n" + "\n".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from stego.video_stego import extract_message_from_video, _frame_capacity, _lsb_embed_bits, _video_metadata_bits
+from utils.crypto import encrypt_bytes
+from utils.payload import container_bits, METHOD_VIDEO_LSB
+
+# Compares seek-based and sequential extraction on a long FFV1 clip whose payload starts late.
+# Run from the repository root: python -m benchmarks.bench_video_extract
+
+
+def make_clip(path, frame_count, width, height, start_frame, message, password):
+    bits = container_bits(encrypt_bytes(message.encode(), password), METHOD_VIDEO_LSB)
+    bits_per_frame = _frame_capacity(width * height)
+    payload_frames = -(-len(bits) // bits_per_frame)
+    if start_frame + payload_frames - 1 > frame_count:
+        raise ValueError("Clip is too short for the payload")
+
+    rng = np.random.default_rng(0)
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'FFV1'), 30, (width, height))
+    for frame_number in range(1, frame_count + 1):
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        if frame_number == 1:
+            _lsb_embed_bits(frame, _video_metadata_bits(start_frame, bits_per_frame))
+        elif start_frame <= frame_number < start_frame + payload_frames:
+            offset = (frame_number - start_frame) * bits_per_frame
+            _lsb_embed_bits(frame, bits[offset:offset + bits_per_frame])
+        out.write(frame)
+    out.release()
+
+def time_extraction(path, password, seek, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extract_message_from_video(path, password, seek=seek)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark seek vs sequential video extraction")
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    message, password = "benchmark message", "benchmark"
+    start_frame = args.frames - 10
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "long.avi")
+        make_clip(path, args.frames, args.width, args.height, start_frame, message, password)
+
+        for seek in (True, False):
+            seconds = time_extraction(path, password, seek, args.repeat)
+            print(f"{'seek' if seek else 'sequential':>10}: {seconds:.3f} s")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 
 import argparse
-from stego.image_stego import hide_message_in_image_lsb, extract_message_from_image_lsb, hide_message_in_image_dct, extract_message_from_image_dct
-from stego.audio_stego import hide_message_in_audio_lsb, extract_message_from_audio_lsb, hide_message_in_audio_echo, extract_message_from_audio_echo
-from stego.video_stego import hide_message_in_video, extract_message_from_video
+import sys
+import time
+from stego.registry import get_method, FILE_TYPES
+from utils.compression import available_codecs
 # from analysis.steganalysis import 
 
 def main():
@@ -13,19 +14,52 @@ def main():
     
     # Hide command
     hide_parser = subparsers.add_parser("hide", help="Hide a message in a file")
-    hide_parser.add_argument("file_type", choices=["image", "audio", "video"], help="Type of file to hide message in")
+    hide_parser.add_argument("file_type", choices=FILE_TYPES, help="Type of file to hide message in")
     hide_parser.add_argument("method", help="Method to use for hiding (lsb, dct, echo)")
     hide_parser.add_argument("input_file", help="Path to the input file")
     hide_parser.add_argument("output_file", help="Path to save the output file")
-    hide_parser.add_argument("message", help="Message to hide")
+    hide_parser.add_argument("message", nargs="?", help="Message to hide")
+    hide_parser.add_argument("--payload-file", help="Hide the contents of this file instead of a message (audio lsb, video lsb)")
     hide_parser.add_argument("--password", required=True, help="Password for encryption")
+    hide_parser.add_argument("--envelope", choices=["gcm", "fernet"], default="gcm",
+                             help="Ciphertext format: compact binary AES-GCM (default) or base64 Fernet")
+    hide_parser.add_argument("--compression", choices=available_codecs(), default="zlib",
+                             help="Compress the message before encryption; skipped automatically when it does not help (default: zlib)")
+    hide_parser.add_argument("--workers", type=int, default=1, help="Worker processes for video re-encoding (default: 1)")
+    hide_parser.add_argument("--scatter", action="store_true",
+                             help="Spread the message over password-derived positions instead of writing it from the start (image, audio lsb, video)")
+    hide_parser.add_argument("--progress", action="store_true", help="Show progress, throughput and ETA on stderr")
+    hide_parser.add_argument("--profile", nargs="?", const="-", metavar="PATH",
+                             help="Write a JSON report of per-stage timings, counters and peak memory to PATH (default: stderr)")
     
     # Extract command
     extract_parser = subparsers.add_parser("extract", help="Extract a hidden message from a file")
-    extract_parser.add_argument("file_type", choices=["image", "audio", "video"], help="Type of file to extract message from")
+    extract_parser.add_argument("file_type", choices=FILE_TYPES, help="Type of file to extract message from")
     extract_parser.add_argument("method", help="Method used for hiding (lsb, dct, echo)")
     extract_parser.add_argument("input_file", help="Path to the file with hidden message")
     extract_parser.add_argument("--password", required=True, help="Password for decryption")
+    extract_parser.add_argument("--output-file", help="Write a payload hidden with --payload-file to this file")
+    extract_parser.add_argument("--scatter", action="store_true",
+                                help="The message was hidden with --scatter (image and audio; video detects it)")
+    extract_parser.add_argument("--progress", action="store_true", help="Show progress, throughput and ETA on stderr")
+    extract_parser.add_argument("--profile", nargs="?", const="-", metavar="PATH",
+                                help="Write a JSON report of per-stage timings, counters and peak memory to PATH (default: stderr)")
+    
+    # Capacity command
+    capacity_parser = subparsers.add_parser("capacity", help="Report how much each method can hide, reading file headers only")
+    capacity_parser.add_argument("paths", nargs="+", help="Carrier files or directories")
+    capacity_parser.add_argument("--file-type", choices=FILE_TYPES, help="Treat every file as this type instead of guessing from the extension")
+    capacity_parser.add_argument("--method", help="Only report this method")
+    capacity_parser.add_argument("--message-length", type=int, help="Also report the embedded size of a message of this many bytes and whether it fits")
+    capacity_parser.add_argument("--envelope", choices=["gcm", "fernet"], default="gcm", help="Ciphertext format to plan for (default: gcm)")
+    capacity_parser.add_argument("--json", action="store_true", help="Print one JSON object per line")
+    
+    # Batch command
+    batch_parser = subparsers.add_parser("batch", help="Run hide/extract jobs from a CSV or JSONL manifest")
+    batch_parser.add_argument("manifest", help="CSV or JSONL file with one job per row (see stego/batch.py for the columns)")
+    batch_parser.add_argument("--password", help="Password for jobs that do not set their own")
+    batch_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    batch_parser.add_argument("--results", default="-", help="Write JSONL results here instead of stdout")
     
     # Analyze command
     # analyze_parser = subparsers.add_parser("analyze", help="Analyze a file for potential hidden messages")
@@ -36,60 +70,102 @@ def main():
     args = parser.parse_args()
     
     # Process commands
-    if args.command == "hide":
-        if args.file_type == "image":
-            if args.method.lower() == "lsb":
-                hide_message_in_image_lsb(args.input_file, args.message, args.password, args.output_file)
-            elif args.method.lower() == "dct":
-                hide_message_in_image_dct(args.input_file, args.message, args.password, args.output_file)
-            else:
-                print(f"Unsupported method '{args.method}' for image steganography")
+    if args.command == "hide" and (args.message is None) == (args.payload_file is None):
+        parser.error("hide needs either a message or --payload-file")
+    
+    if args.command in ("hide", "extract"):
+        # Only the engine module for the requested method is imported.
+        method = get_method(args.file_type, args.method)
+        if method is None:
+            print(f"Unsupported method '{args.method}' for {args.file_type} steganography")
+            return
         
-        elif args.file_type == "audio":
-            if args.method.lower() == "lsb":
-                hide_message_in_audio_lsb(args.input_file, args.message, args.password, args.output_file)
-            elif args.method.lower() == "echo":
-                hide_message_in_audio_echo(args.input_file, args.message, args.password, args.output_file)
-            else:
-                print(f"Unsupported method '{args.method}' for audio steganography")
+        file_payload, file_entry = (args.payload_file, method.hide_file) if args.command == "hide" else (args.output_file, method.extract_file)
+        if file_payload and file_entry is None:
+            print(f"File payloads are not supported for {args.file_type} {args.method}; use audio or video lsb")
+            return
+        if args.scatter and (file_payload or "scatter" not in method.hide_options):
+            print(f"--scatter is not supported for {'file payloads' if file_payload else f'{args.file_type} {args.method}'}")
+            return
         
-        elif args.file_type == "video":
-            if args.method.lower() == "lsb":
-                hide_message_in_video(args.input_file, args.message, args.password, args.output_file)
-            else:
-                print(f"Unsupported method '{args.method}' for video steganography")
-    
-    elif args.command == "extract":
-        if args.file_type == "image":
-            if args.method.lower() == "lsb":
-                message = extract_message_from_image_lsb(args.input_file, args.password)
-            elif args.method.lower() == "dct":
-                message = extract_message_from_image_dct(args.input_file, args.password)
-            else:
-                print(f"Unsupported method '{args.method}' for image steganography")
-                return
+        # Progress callbacks are only passed when asked for, so plugin methods need not accept them.
+        reporting = {"progress": _print_progress} if args.progress else {}
+        
+        profile = None
+        if args.profile:
+            from utils.profiling import enable_profiling
+            profile = enable_profiling()
         
-        elif args.file_type == "audio":
-            if args.method.lower() == "lsb":
-                message = extract_message_from_audio_lsb(args.input_file, args.password)
-            elif args.method.lower() == "echo":
-                message = extract_message_from_audio_echo(args.input_file, args.password)
+        try:
+            if args.command == "hide" and args.payload_file:
+                method.load("hide_file")(args.input_file, args.payload_file, args.password, args.output_file, **reporting)
+            
+            elif args.command == "extract" and args.output_file:
+                print(method.load("extract_file")(args.input_file, args.password, args.output_file, **reporting))
+            
+            elif args.command == "hide":
+                options = {name: getattr(args, name) for name in method.hide_options}
+                method.load("hide")(args.input_file, args.message, args.password, args.output_file,
+                                    envelope=args.envelope, compression=args.compression, **options, **reporting)
+            
             else:
-                print(f"Unsupported method '{args.method}' for audio steganography")
-                return
+                options = {name: getattr(args, name) for name in method.extract_options}
+                message = method.load("extract")(args.input_file, args.password, **options, **reporting)
+                print(f"Extracted message: {message}")
+        finally:
+            if profile is not None:
+                # Written even when the run fails, so slow failures can be diagnosed too.
+                import json
+                from utils.profiling import disable_profiling
+                
+                disable_profiling()
+                report = {"command": args.command, "file_type": args.file_type, "method": args.method, **profile.as_dict()}
+                if args.profile == "-":
+                    print(json.dumps(report, indent=2), file=sys.stderr)
+                else:
+                    with open(args.profile, "w") as f:
+                        json.dump(report, f, indent=2)
+    
+    elif args.command == "capacity":
+        import json
+        from stego.capacity import scan_capacity
         
-        elif args.file_type == "video":
-            if args.method.lower() == "lsb":
-                message = extract_message_from_video(args.input_file, args.password)
+        for report in scan_capacity(args.paths, args.file_type, args.method, args.envelope, args.message_length):
+            if args.json:
+                print(json.dumps(report))
+            elif "error" in report:
+                print(f"{report['path']}: {report.get('method') or ''} error: {report['error']}")
             else:
-                print(f"Unsupported method '{args.method}' for video steganography")
-                return
+                line = f"{report['path']}: {report['file_type']} {report['method']} holds up to {report['max_message_bytes']} bytes"
+                if "fits" in report:
+                    line += (f"; a {report['message_bytes']}-byte message embeds as {report['embedded_bits']} bits "
+                             f"(+{report['encryption_overhead_bytes']} bytes encryption), {'fits' if report['fits'] else 'does not fit'}")
+                print(line)
+    
+    elif args.command == "batch":
+        from stego.batch import load_manifest, run_batch
         
-        print(f"Extracted message: {message}")
+        jobs = load_manifest(args.manifest)
+        results = sys.stdout if args.results == "-" else open(args.results, "w")
+        try:
+            started = time.perf_counter()
+            counts = run_batch(jobs, results, args.workers, args.password)
+        finally:
+            if results is not sys.stdout:
+                results.close()
+        print(f"{len(jobs)} jobs in {time.perf_counter() - started:.1f}s: "
+              f"{counts['ok']} ok, {counts['failed']} failed, {counts['error']} errors", file=sys.stderr)
     
     # elif args.command == "analyze":
     #     if args.method == "histogram":
     #         analyze_image_histogram(args.input_file, args.reference)
 
+def _print_progress(event):
+    done = f"{event.done}/{event.total}" if event.total else str(event.done)
+    percent = f"{100 * event.done / event.total:5.1f}% " if event.total else ""
+    eta = f"  ETA {event.eta:.0f}s" if event.eta is not None else ""
+    end = "\n" if event.total and event.done >= event.total else ""
+    print(f"\r{percent}{done} {event.unit}  {event.rate:.1f} {event.unit}/s{eta}   ", end=end, file=sys.stderr, flush=True)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,91 +1,362 @@
+import mmap
+import os
+import shutil
+import struct
 import wave
 import numpy as np
-from utils.crypto import text_to_binary, binary_to_text, encrypt, decrypt
-from scipy.io import wavfile
+from typing import Optional
+from utils import profiling
+from utils.compression import compress_payload, COMPRESSION_ZLIB
+from utils.crypto import (encrypt_bytes, decrypt_payload, encrypt_stream, decrypt_stream_to_file, stream_ciphertext_size,
+                          ENVELOPE_GCM, DEFAULT_STREAM_CHUNK_SIZE)
+from utils.progress import CancelToken, JobCancelled, Progress, ProgressCallback, removing_on_cancel, track_bits
+from utils.scatter import scatter_key, scatter_layout, band_slice, ScatterBitReader, ScatterPermutation
+from utils.payload import (container_bits, read_container_with_flags, read_container_stream, stream_container_bits,
+                           StreamBitReader, compression_flags, flags_compression, HEADER_BITS,
+                           METHOD_AUDIO_LSB, METHOD_AUDIO_ECHO)
 
-def hide_message_in_audio_lsb(audio_path: str, message: str, password: str, output_path: str) -> None:
-    encrypted_message = encrypt(message, password)
-    binary_message = text_to_binary(encrypted_message) + '1111111111111110'
-    
-    with wave.open(audio_path, 'rb') as wav:
+AUDIO_LSB_MODES = ('memory', 'stream', 'mmap')
+DEFAULT_CHUNK_FRAMES = 1 << 16
+
+ECHO_SEGMENT_SECONDS = 0.1
+ECHO_TRANSITION_SECONDS = 0.005
+ECHO_BATCH_SEGMENTS = 256
+
+def hide_message_in_audio_lsb(audio_path: str, message: str, password: str, output_path: str,
+                              mode: str = 'memory', chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+                              envelope: str = ENVELOPE_GCM, compression: str = COMPRESSION_ZLIB, scatter: bool = False,
+                              progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> None:
+    _check_lsb_mode(mode)
+    
+    compressed_message, codec_id = compress_payload(message.encode(), compression)
+    encrypted_message = encrypt_bytes(compressed_message, password, envelope)
+    binary_array = container_bits(encrypted_message, METHOD_AUDIO_LSB, compression_flags(codec_id))
+    key = scatter_key(password) if scatter else None
+    
+    if mode == 'stream':
+        _hide_lsb_stream(audio_path, [binary_array], len(binary_array), output_path, chunk_frames,
+                         Progress(progress, cancel, unit='samples'), key)
+        print(f"Message successfully hidden in {output_path}")
+        return
+    
+    if mode == 'mmap':
+        _hide_lsb_mmap(audio_path, binary_array, output_path, Progress(progress, cancel, total=2), key)
+        print(f"Message successfully hidden in {output_path}")
+        return
+    
+    tracker = Progress(progress, cancel, total=3)
+    
+    with profiling.span('audio.decode'), wave.open(audio_path, 'rb') as wav:
         n_channels = wav.getnchannels()
         sample_width = wav.getsampwidth()
         frame_rate = wav.getframerate()
         n_frames = wav.getnframes()
         
         frames = wav.readframes(n_frames)
+    profiling.count('bytes_read', len(frames))
     
-    max_message_bits = len(frames) * 8 // sample_width
-    if len(binary_message) > max_message_bits:
+    max_message_bits = len(frames) // sample_width
+    if len(binary_array) > max_message_bits:
         raise ValueError(f"Message too large to hide in this audio. Max size: {max_message_bits // 8} bytes")
     
-    if sample_width == 1:
-        dtype = np.uint8
-    elif sample_width == 2:
-        dtype = np.int16
-    else:
-        raise ValueError("Unsupported sample width")
-    
-    samples = np.frombuffer(frames, dtype=dtype)
+    samples = np.frombuffer(frames, dtype=_sample_dtype(sample_width))
+    profiling.count('samples', len(samples))
+    tracker.advance()
     
-    binary_array = np.array([int(bit) for bit in binary_message], dtype=np.uint8)
+    positions = None
+    if key is not None:
+        positions, binary_array = scatter_layout(binary_array, ScatterPermutation(key, len(samples)))
     
-    modified_samples = samples.copy()
-    
-    message_length = len(binary_array)
-    
-    modified_samples[:message_length] &= ~1
-    
-    modified_samples[:message_length] |= binary_array
-    
-    modified_frames = modified_samples.tobytes()
+    with profiling.span('audio.embed'):
+        modified_samples = samples.copy()
+        
+        _embed_lsb(modified_samples, binary_array, positions)
+        
+        modified_frames = modified_samples.tobytes()
+    tracker.advance()
     
-    with wave.open(output_path, 'wb') as wav_out:
+    with profiling.span('audio.encode'), wave.open(output_path, 'wb') as wav_out:
         wav_out.setparams((n_channels, sample_width, frame_rate, len(modified_samples), 'NONE', 'not compressed'))
         wav_out.writeframes(modified_frames)
+    profiling.count_file_size('bytes_written', output_path)
+    tracker.finish()
     
     print(f"Message successfully hidden in {output_path}")
 
-def extract_message_from_audio_lsb(audio_path: str, password: str) -> str:
+def extract_message_from_audio_lsb(audio_path: str, password: str,
+                                   mode: str = 'memory', chunk_frames: int = DEFAULT_CHUNK_FRAMES, scatter: bool = False,
+                                   progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> str:
+    _check_lsb_mode(mode)
+    
+    if mode == 'mmap':
+        return _extract_lsb_mmap(audio_path, password, Progress(progress, cancel, unit='samples'), scatter)
+    
     with wave.open(audio_path, 'rb') as wav:
-        sample_width = wav.getsampwidth()
-        n_frames = wav.getnframes()
+        dtype = _sample_dtype(wav.getsampwidth())
         
-        frames = wav.readframes(n_frames)
-    
+        if mode == 'stream' and scatter:
+            tracker = Progress(progress, cancel, unit='samples')
+            permutation = ScatterPermutation(scatter_key(password), wav.getnframes() * wav.getnchannels())
+            read_bits = ScatterBitReader(_lsb_stream_gather(audio_path, dtype, chunk_frames, tracker), permutation)
+            # One pass for the payload header and one for the payload.
+            tracker.total = 2 * permutation.size
+        elif mode == 'stream':
+            tracker = Progress(progress, cancel, unit='samples')
+            read_bits = track_bits(StreamBitReader(_iter_lsb_chunks(wav, dtype, chunk_frames)), tracker)
+        else:
+            tracker = Progress(progress, cancel, total=2)
+            with profiling.span('audio.decode'):
+                samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=dtype)
+            profiling.count('bytes_read', samples.nbytes)
+            profiling.count('samples', len(samples))
+            tracker.advance()
+            read_bits = _lsb_sample_reader(samples, password, scatter)
+        
+        return _decode_lsb(read_bits, password, tracker, legacy_fallback=not scatter)
+
+def hide_file_in_audio_lsb(audio_path: str, payload_path: str, password: str, output_path: str,
+                           chunk_frames: int = DEFAULT_CHUNK_FRAMES, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+                           progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> None:
+    # Streams the file through chunked encryption into the carrier; neither is ever read whole.
+    encrypted_size = stream_ciphertext_size(os.path.getsize(payload_path), chunk_size)
+    
+    with open(payload_path, 'rb') as payload:
+        bit_chunks = stream_container_bits(encrypt_stream(payload, password, chunk_size), encrypted_size, METHOD_AUDIO_LSB)
+        _hide_lsb_stream(audio_path, bit_chunks, HEADER_BITS + encrypted_size * 8, output_path, chunk_frames,
+                         Progress(progress, cancel, unit='samples'))
+    
+    print(f"File successfully hidden in {output_path}")
+
+def extract_file_from_audio_lsb(audio_path: str, password: str, output_path: str,
+                                chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+                                progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> str:
+    tracker = Progress(progress, cancel, unit='samples')
+    try:
+        with wave.open(audio_path, 'rb') as wav:
+            read_bits = StreamBitReader(_iter_lsb_chunks(wav, _sample_dtype(wav.getsampwidth()), chunk_frames))
+            chunks = read_container_stream(track_bits(read_bits, tracker), METHOD_AUDIO_LSB)
+            if chunks is None:
+                return "No hidden message found"
+            result = decrypt_stream_to_file(chunks, password, output_path)
+            tracker.finish()
+            return result
+    except Exception as e:
+        return f"Failed to extract message: {str(e)}"
+
+def _decode_lsb(read_bits, password, tracker, legacy_fallback=True):
+    try:
+        with profiling.span('audio.extract'):
+            found = read_container_with_flags(read_bits, METHOD_AUDIO_LSB, legacy_fallback=legacy_fallback)
+        tracker.check()
+        tracker.finish()
+        if found is None:
+            return "No hidden message found"
+        encrypted_message, flags = found
+        return decrypt_payload(encrypted_message, password, flags_compression(flags))
+    except Exception as e:
+        return f"Failed to extract message: {str(e)}"
+
+def _check_lsb_mode(mode):
+    if mode not in AUDIO_LSB_MODES:
+        raise ValueError(f"Unsupported mode '{mode}'. Choose one of: {', '.join(AUDIO_LSB_MODES)}")
+
+def _sample_dtype(sample_width):
     if sample_width == 1:
-        dtype = np.uint8
+        return np.uint8
     elif sample_width == 2:
-        dtype = np.int16
+        return np.int16
     else:
         raise ValueError("Unsupported sample width")
+
+def _embed_lsb(samples, bits, positions=None):
+    # Writes `bits` into the first samples, or into the samples at sorted `positions`.
+    if positions is None:
+        positions = slice(0, len(bits))
+    samples[positions] = (samples[positions] & ~samples.dtype.type(1)) | bits
+
+def _lsb_sample_reader(samples, password, scatter):
+    if not scatter:
+        return lambda start, count: (samples[start:start + count] & 1).astype(np.uint8)
+    gather = lambda positions: (samples[positions] & 1).astype(np.uint8)
+    return ScatterBitReader(gather, ScatterPermutation(scatter_key(password), len(samples)))
+
+def _lsb_stream_gather(audio_path, dtype, chunk_frames, tracker):
+    # gather() for ScatterBitReader over a WAV read in chunks: every call makes one pass over the samples,
+    # stopping after the chunk that holds the last requested position.
+    def gather(positions):
+        values = []
+        first = 0
+        with wave.open(audio_path, 'rb') as wav:
+            for bits in _iter_lsb_chunks(wav, dtype, chunk_frames):
+                if not len(positions) or first > positions[-1]:
+                    break
+                chosen = band_slice(positions, first, first + len(bits))
+                values.append(bits[positions[chosen] - first])
+                first += len(bits)
+                tracker.advance(len(bits))
+        return np.concatenate(values) if values else np.zeros(0, dtype=np.uint8)
+    return gather
+
+def _hide_lsb_stream(audio_path, bit_chunks, total_bits, output_path, chunk_frames, tracker, key=None):
+    # `bit_chunks` yields the payload bits in pieces of any size; they are pulled in only as samples need them.
+    # With a scatter `key`, the bits (a message, so a single chunk) go to keyed positions instead.
+    with wave.open(audio_path, 'rb') as wav:
+        n_channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        dtype = _sample_dtype(sample_width)
+        
+        max_message_bits = wav.getnframes() * n_channels
+        if total_bits > max_message_bits:
+            raise ValueError(f"Message too large to hide in this audio. Max size: {max_message_bits // 8} bytes")
+        
+        positions = None
+        if key is not None:
+            positions, bits = scatter_layout(np.concatenate(list(bit_chunks)), ScatterPermutation(key, max_message_bits))
+            bit_chunks = [bits]
+        
+        read_bits = StreamBitReader(bit_chunks)
+        tracker.total = max_message_bits
+        
+        with removing_on_cancel(output_path), wave.open(output_path, 'wb') as wav_out:
+            wav_out.setparams(wav.getparams())
+            
+            written = 0
+            first_sample = 0
+            while True:
+                with profiling.span('audio.decode'):
+                    frames = wav.readframes(chunk_frames)
+                if not frames:
+                    break
+                profiling.count('bytes_read', len(frames))
+                profiling.count('samples', len(frames) // sample_width)
+                
+                if written < total_bits:
+                    with profiling.span('audio.embed'):
+                        samples = np.frombuffer(frames, dtype=dtype).copy()
+                        if positions is None:
+                            chunk_bits = read_bits(written, min(len(samples), total_bits - written))
+                            _embed_lsb(samples, chunk_bits)
+                        else:
+                            # Sorted positions consume the reordered bits front to back.
+                            chosen = band_slice(positions, first_sample, first_sample + len(samples))
+                            chunk_bits = read_bits(written, chosen.stop - chosen.start)
+                            _embed_lsb(samples, chunk_bits, positions[chosen] - first_sample)
+                        written += len(chunk_bits)
+                        frames = samples.tobytes()
+                first_sample += len(frames) // sample_width
+                
+                with profiling.span('audio.encode'):
+                    wav_out.writeframesraw(frames)
+                profiling.count('bytes_written', len(frames))
+                tracker.advance(len(frames) // sample_width)
+        tracker.finish()
+
+def _locate_wav_data(f):
+    # Walks the RIFF chunks and returns (data offset, data size, sample width) without reading samples.
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+        raise ValueError("Not a RIFF/WAVE file")
+    
+    sample_width = None
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            raise ValueError("WAV file has no data chunk")
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+        
+        if chunk_id == b'fmt ':
+            fmt = f.read(chunk_size)
+            format_tag, _, _, _, _, bits_per_sample = struct.unpack('<HHIIHH', fmt[:16])
+            if format_tag not in (1, 0xFFFE):
+                raise ValueError("Only uncompressed PCM WAV files are supported")
+            sample_width = (bits_per_sample + 7) // 8
+            f.seek(chunk_size & 1, 1)
+        elif chunk_id == b'data':
+            if sample_width is None:
+                raise ValueError("WAV data chunk precedes its fmt chunk")
+            data_offset = f.tell()
+            file_size = f.seek(0, 2)
+            return data_offset, min(chunk_size, file_size - data_offset), sample_width
+        else:
+            f.seek(chunk_size + (chunk_size & 1), 1)
+
+def _hide_lsb_mmap(audio_path, bits, output_path, tracker, key=None):
+    with open(audio_path, 'rb') as f:
+        data_offset, data_size, sample_width = _locate_wav_data(f)
+    dtype = _sample_dtype(sample_width)
     
-    samples = np.frombuffer(frames, dtype=dtype)
-    
-    lsb_array = samples & 1
-    
-    binary_message = ''.join(map(str, lsb_array))
-    
-    delimiter = '1111111111111110'
-    pos = binary_message.find(delimiter)
-    
-    if pos >= 0:
-        binary_message = binary_message[:pos]
-        try:
-            padding = 8 - (len(binary_message) % 8) if len(binary_message) % 8 != 0 else 0
-            binary_message += '0' * padding
-            encrypted_message = binary_to_text(binary_message)
-            return decrypt(encrypted_message, password)
-        except Exception as e:
-            return f"Failed to extract message: {str(e)}"
+    max_message_bits = data_size // sample_width
+    if len(bits) > max_message_bits:
+        raise ValueError(f"Message too large to hide in this audio. Max size: {max_message_bits // 8} bytes")
     
-    return "No hidden message found"
+    positions = None
+    if key is not None:
+        positions, bits = scatter_layout(bits, ScatterPermutation(key, max_message_bits))
+    used_samples = len(bits) if positions is None else int(positions[-1]) + 1
+    
+    with profiling.span('audio.copy'):
+        shutil.copyfile(audio_path, output_path)
+    profiling.count_file_size('bytes_written', output_path)
+    with removing_on_cancel(output_path):
+        tracker.advance()
+    
+    # Map only the pages up to the last payload sample; mmap offsets must be granularity-aligned.
+    map_offset = data_offset - data_offset % mmap.ALLOCATIONGRANULARITY
+    map_length = data_offset - map_offset + used_samples * sample_width
+    
+    with open(output_path, 'r+b') as f, mmap.mmap(f.fileno(), map_length, offset=map_offset) as mm:
+        with profiling.span('audio.embed'):
+            samples = np.frombuffer(mm, dtype=dtype, count=used_samples, offset=data_offset - map_offset)
+            _embed_lsb(samples, bits, positions)
+            del samples
+            mm.flush()
+    profiling.count('samples', used_samples)
+    tracker.finish()
 
-def hide_message_in_audio_echo(audio_path: str, message: str, password: str, output_path: str) -> None:
-    encrypted_message = encrypt(message, password)
-    binary_message = text_to_binary(encrypted_message)
-    
-    rate, audio = wavfile.read(audio_path)
+def _extract_lsb_mmap(audio_path, password, tracker, scatter=False):
+    with open(audio_path, 'rb') as f:
+        data_offset, data_size, sample_width = _locate_wav_data(f)
+        dtype = _sample_dtype(sample_width)
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            samples = np.frombuffer(mm, dtype=dtype, count=data_size // sample_width, offset=data_offset)
+            read_bits = track_bits(_lsb_sample_reader(samples, password, scatter), tracker)
+            try:
+                return _decode_lsb(read_bits, password, tracker, legacy_fallback=not scatter)
+            except JobCancelled as e:
+                # Frames in the traceback still hold the reader and its view of the mmap.
+                raise e.with_traceback(None)
+            finally:
+                # The mmap cannot close while NumPy still exports its buffer, which the reader holds too.
+                del samples, read_bits
+
+def _iter_lsb_chunks(wav, dtype, chunk_frames):
+    while True:
+        with profiling.span('audio.decode'):
+            frames = wav.readframes(chunk_frames)
+        if not frames:
+            return
+        profiling.count('bytes_read', len(frames))
+        samples = np.frombuffer(frames, dtype=dtype)
+        profiling.count('samples', len(samples))
+        yield (samples & 1).astype(np.uint8)
+
+def hide_message_in_audio_echo(audio_path: str, message: str, password: str, output_path: str,
+                               envelope: str = ENVELOPE_GCM, compression: str = COMPRESSION_ZLIB,
+                               progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> None:
+    tracker = Progress(progress, cancel, total=3)
+    compressed_message, codec_id = compress_payload(message.encode(), compression)
+    encrypted_message = encrypt_bytes(compressed_message, password, envelope)
+    bits = container_bits(encrypted_message, METHOD_AUDIO_ECHO, compression_flags(codec_id))
+    
+    # Only echo hiding needs scipy; importing it lazily keeps the LSB paths light.
+    from scipy.io import wavfile
+    
+    with profiling.span('audio.decode'):
+        rate, audio = wavfile.read(audio_path)
+    profiling.count('bytes_read', audio.nbytes)
+    profiling.count('samples', audio.size)
+    tracker.advance()
     original_audio = audio.copy()
     
     if audio.dtype != np.float32:
@@ -100,49 +371,52 @@ def hide_message_in_audio_echo(audio_path: str, message: str, password: str, out
     delay_0 = int(rate * 0.001)
     delay_1 = int(rate * 0.003)
     
-    segment_length = int(rate * 0.1)
+    segment_length = int(rate * ECHO_SEGMENT_SECONDS)
     num_segments = len(audio) // segment_length
-    if len(binary_message) > num_segments:
+    if len(bits) > num_segments:
         raise ValueError(f"Message too large. Max length: {num_segments//8} bytes")
     
-    binary_message += '1111111111111110'
-    
-    output_audio = np.copy(audio)
-    
-    for i in range(len(binary_message)):
-        if i >= num_segments:
-            break
-        
-        start = i * segment_length
-        end = min((i + 1) * segment_length, len(audio))
-        segment = audio[start:end]
+    with profiling.span('audio.embed'):
+        output_audio = np.copy(audio)
         
-        delay = delay_1 if binary_message[i] == '1' else delay_0
+        payload_length = len(bits) * segment_length
+        region = audio[:payload_length]
         
-        echo = np.zeros_like(segment)
-        echo[delay:] = segment[:-delay] * decay if delay < len(segment) else segment * 0
+        # Mix two fully delayed copies of the signal, switching between them per segment.
+        mask = _echo_bit_mask(bits, segment_length, int(rate * ECHO_TRANSITION_SECONDS))
+        echo = mask * _delayed(region, delay_1) + (1 - mask) * _delayed(region, delay_0)
         
-        output_segment = segment + echo
+        segments = (region + decay * echo).reshape(len(bits), segment_length)
+        peaks = np.max(np.abs(segments), axis=1, keepdims=True)
+        segments /= np.where(peaks > 1.0, peaks, 1.0)
         
-        max_val = np.max(np.abs(output_segment))
-        if max_val > 1.0:
-            output_segment = output_segment / max_val
-        
-        output_audio[start:end] = output_segment
-    
-    if original_audio.dtype == np.int16:
-        output_audio = (output_audio * 32767.0).astype(np.int16)
+        output_audio[:payload_length] = segments.reshape(-1)
+    tracker.advance()
     
-    if len(original_audio.shape) > 1 and original_audio.shape[1] > 1:
-        output_stereo = np.column_stack((output_audio, original_audio[:len(output_audio), 1]))
-        wavfile.write(output_path, rate, output_stereo)
-    else:
-        wavfile.write(output_path, rate, output_audio)
+    with profiling.span('audio.encode'):
+        if original_audio.dtype == np.int16:
+            output_audio = (output_audio * 32767.0).astype(np.int16)
+        
+        if len(original_audio.shape) > 1 and original_audio.shape[1] > 1:
+            output_stereo = np.column_stack((output_audio, original_audio[:len(output_audio), 1]))
+            wavfile.write(output_path, rate, output_stereo)
+        else:
+            wavfile.write(output_path, rate, output_audio)
+    profiling.count_file_size('bytes_written', output_path)
+    tracker.finish()
     
     print(f"Message successfully hidden in {output_path} (echo hiding)")
 
-def extract_message_from_audio_echo(audio_path: str, password: str) -> str:
-    rate, audio = wavfile.read(audio_path)
+def extract_message_from_audio_echo(audio_path: str, password: str,
+                                    progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> str:
+    tracker = Progress(progress, cancel, total=2)
+    from scipy.io import wavfile
+    
+    with profiling.span('audio.decode'):
+        rate, audio = wavfile.read(audio_path)
+    profiling.count('bytes_read', audio.nbytes)
+    profiling.count('samples', audio.size)
+    tracker.advance()
     
     if len(audio.shape) > 1:
         audio = audio[:, 0]
@@ -152,49 +426,59 @@ def extract_message_from_audio_echo(audio_path: str, password: str) -> str:
         if audio.dtype == np.int16:
             audio = audio / 32767.0
     
+    try:
+        with profiling.span('audio.extract'):
+            found = read_container_with_flags(_echo_bit_reader(audio, rate), METHOD_AUDIO_ECHO)
+        tracker.finish()
+        if found is None:
+            return "No hidden message found"
+        encrypted_message, flags = found
+        return decrypt_payload(encrypted_message, password, flags_compression(flags))
+    except Exception as e:
+        return f"Failed to extract message: {str(e)}"
+
+def _delayed(signal, delay):
+    delayed = np.zeros_like(signal)
+    if delay < len(signal):
+        delayed[delay:] = signal[:len(signal) - delay]
+    return delayed
+
+def _echo_bit_mask(bits, segment_length, transition):
+    # Per-sample bit mask with linear ramps of `transition` samples between differing segments.
+    mask = np.repeat(bits.astype(np.float32), segment_length)
+    if transition > 1:
+        padded = np.pad(mask, (transition // 2, transition - transition // 2 - 1), mode='edge')
+        cumulative = np.concatenate(([0.0], np.cumsum(padded, dtype=np.float64)))
+        mask = ((cumulative[transition:] - cumulative[:-transition]) / transition).astype(np.float32)
+    return mask
+
+def _echo_bit_reader(audio, rate):
     delay_0 = int(rate * 0.001)
     delay_1 = int(rate * 0.003)
-    segment_length = int(rate * 0.1)
+    segment_length = int(rate * ECHO_SEGMENT_SECONDS)
     
     tolerance = 2
     
-    extracted_bits = []
-    
     num_segments = len(audio) // segment_length
-    for i in range(num_segments):
-        start = i * segment_length
-        end = min((i + 1) * segment_length, len(audio))
-        segment = audio[start:end]
-        
-        windowed_segment = segment * np.hamming(len(segment))
-        spectrum = np.fft.fft(windowed_segment)
-        log_spectrum = np.log(np.abs(spectrum) + 1e-10)
-        cepstrum = np.fft.ifft(log_spectrum).real
-        
-        cepstrum = cepstrum[:len(cepstrum)//2]
-        
-        sum_0 = np.sum(cepstrum[max(0, delay_0-tolerance):min(len(cepstrum), delay_0+tolerance)])
-        sum_1 = np.sum(cepstrum[max(0, delay_1-tolerance):min(len(cepstrum), delay_1+tolerance)])
-        
-        bit = '1' if sum_1 > sum_0 else '0'
-        extracted_bits.append(bit)
-    
-    binary_message = ''.join(extracted_bits)
-    
-    delimiter = '1111111111111110'
-    pos = binary_message.find(delimiter)
-    
-    if pos >= 0:
-        binary_message = binary_message[:pos]
-        try:
-            padding = 8 - (len(binary_message) % 8) if len(binary_message) % 8 != 0 else 0
-            binary_message += '0' * padding
+    window = np.hamming(segment_length)
+    half = segment_length // 2
+    band_0 = slice(max(0, delay_0-tolerance), min(half, delay_0+tolerance))
+    band_1 = slice(max(0, delay_1-tolerance), min(half, delay_1+tolerance))
+    
+    def read_bits(start, count):
+        end = min(start + count, num_segments)
+        extracted_bits = [np.zeros(0, dtype=np.uint8)]
+        for batch_start in range(start, end, ECHO_BATCH_SEGMENTS):
+            batch_end = min(batch_start + ECHO_BATCH_SEGMENTS, end)
+            segments = audio[batch_start * segment_length:batch_end * segment_length].reshape(-1, segment_length)
             
-            encrypted_message = binary_to_text(binary_message)
+            # Real cepstrum of every segment at once.
+            log_spectrum = np.log(np.abs(np.fft.rfft(segments * window, axis=1)) + 1e-10)
+            cepstrum = np.fft.irfft(log_spectrum, n=segment_length, axis=1)[:, :half]
             
-            return decrypt(encrypted_message, password)
-        except Exception as e:
-            return f"Failed to extract message: {str(e)}"
+            sum_0 = cepstrum[:, band_0].sum(axis=1)
+            sum_1 = cepstrum[:, band_1].sum(axis=1)
+            extracted_bits.append((sum_1 > sum_0).astype(np.uint8))
+        return np.concatenate(extracted_bits)
     
-    return "No hidden message found"
-
+    return read_bits
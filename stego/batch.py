@@ -0,0 +1,183 @@
+import csv
+import importlib
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack, redirect_stdout
+from typing import Dict, List, Optional, TextIO
+from stego.registry import get_method
+from utils.compression import COMPRESSION_ZLIB
+from utils.crypto import enable_key_cache, key_session, ENVELOPE_GCM
+
+# Manifest columns (CSV header or JSONL keys):
+#   action         hide | extract
+#   file_type      image | audio | video
+#   method         lsb | dct | echo | any registered method
+#   input          carrier file
+#   output         hide: stego file to write; extract: write a file payload here instead of returning a message
+#   message        hide: text to hide
+#   payload_file   hide: file to hide instead of `message`
+#   password       optional when the batch has a default password
+#   envelope, compression   optional hide settings
+#   scatter        optional; true for messages hidden (or to extract) with --scatter
+BATCH_ACTIONS = ('hide', 'extract')
+
+# Extractors report these outcomes as return strings rather than exceptions.
+EXTRACT_FAILURES = ("No hidden message found", "No valid hidden message found", "Invalid metadata format",
+                    "Failed to extract message", "Decryption failed")
+
+# Jobs queued per worker, so a large manifest is not submitted all at once.
+QUEUED_JOBS_PER_WORKER = 4
+
+def load_manifest(path: str) -> List[Dict[str, str]]:
+    with open(path, newline='') as f:
+        if path.lower().endswith('.csv'):
+            return [{key: value for key, value in row.items() if value} for row in csv.DictReader(f)]
+        return [json.loads(line) for line in f if line.strip()]
+
+def run_batch(jobs: List[Dict[str, str]], results: TextIO, workers: Optional[int] = None,
+              password: Optional[str] = None) -> Dict[str, int]:
+    # Runs the jobs in a pool of warm worker processes and writes one JSON result per line to `results`
+    # as jobs finish. A failing job only produces an error record. Returns counts per status.
+    workers = workers or os.cpu_count() or 1
+    if password:
+        jobs = [{'password': password, **job} for job in jobs]
+
+    method_keys = sorted({(job.get('file_type'), (job.get('method') or '').lower()) for job in jobs})
+    counts = {'ok': 0, 'failed': 0, 'error': 0}
+    pending_jobs = iter(enumerate(jobs))
+    # Jobs that were in flight when a worker died. They are rerun one at a time, so only
+    # the job that actually crashes the worker is reported as an error.
+    suspects = deque()
+
+    def write(record):
+        counts[record['status']] += 1
+        results.write(json.dumps(record) + '\n')
+        results.flush()
+
+    while True:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(method_keys,))
+        try:
+            in_flight = {}
+            broken = False
+            while True:
+                while not broken and not any(isolated for _, isolated in in_flight.values()):
+                    if suspects:
+                        if in_flight:
+                            break
+                        item, isolated = suspects.popleft(), True
+                    elif len(in_flight) < workers * QUEUED_JOBS_PER_WORKER:
+                        item, isolated = next(pending_jobs, None), False
+                    else:
+                        break
+                    if item is None:
+                        break
+                    in_flight[pool.submit(_run_job, *item)] = (item, isolated)
+                if not in_flight:
+                    return counts
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    (index, job), isolated = in_flight.pop(future)
+                    try:
+                        write(future.result())
+                    except BrokenProcessPool as e:
+                        # A worker died, e.g. in a native codec; the pool is restarted for the remaining jobs.
+                        if isolated:
+                            write(_error_record(index, job, e))
+                        else:
+                            suspects.append((index, job))
+                        broken = True
+                    except Exception as e:
+                        write(_error_record(index, job, e))
+                if broken and not in_flight:
+                    break
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+_sessions: Optional[ExitStack] = None
+_session_passwords = set()
+
+def _init_worker(method_keys):
+    # Import every engine and backend the manifest uses before the first job, and keep derived keys
+    # across jobs: hides share one salt and key per password within a worker (see key_session).
+    global _sessions
+    _sessions = ExitStack()
+    enable_key_cache()
+    for file_type, method_name in method_keys:
+        method = get_method(file_type, method_name) if file_type and method_name else None
+        if method is None:
+            continue
+        for entry in ('hide', 'extract', 'hide_file', 'extract_file'):
+            if getattr(method, entry) is not None:
+                method.load(entry)
+        for module in method.preload:
+            importlib.import_module(module)
+
+def _run_job(index, job):
+    started = time.perf_counter()
+    record = {'index': index, 'action': job.get('action'), 'file_type': job.get('file_type'),
+              'method': job.get('method'), 'input': job.get('input')}
+    log = io.StringIO()
+    try:
+        with redirect_stdout(log):
+            record.update(_execute(job))
+    except Exception as e:
+        record.update(status='error', error=f"{type(e).__name__}: {e}")
+    record['seconds'] = round(time.perf_counter() - started, 6)
+    if log.getvalue().strip():
+        record['log'] = log.getvalue().strip().splitlines()
+    return record
+
+def _execute(job):
+    action = job.get('action')
+    if action not in BATCH_ACTIONS:
+        raise ValueError(f"Unsupported action '{action}'. Choose one of: {', '.join(BATCH_ACTIONS)}")
+    for field in ('file_type', 'method', 'input', 'password'):
+        if not job.get(field):
+            raise ValueError(f"Job has no '{field}'")
+
+    method = get_method(job['file_type'], job['method'])
+    if method is None:
+        raise ValueError(f"Unsupported method '{job['method']}' for {job['file_type']} steganography")
+
+    password = job['password']
+    output = job.get('output')
+    scatter = str(job.get('scatter', '')).lower() in ('1', 'true', 'yes')
+    if scatter and 'scatter' not in method.hide_options:
+        raise ValueError(f"Method '{job['method']}' for {job['file_type']} does not support scatter")
+
+    if action == 'hide':
+        if not output:
+            raise ValueError("Job has no 'output'")
+        if password not in _session_passwords and _sessions is not None:
+            _sessions.enter_context(key_session(password))
+            _session_passwords.add(password)
+
+        if job.get('payload_file'):
+            method.load('hide_file')(job['input'], job['payload_file'], password, output)
+        elif job.get('message') is not None:
+            method.load('hide')(job['input'], job['message'], password, output,
+                                envelope=job.get('envelope') or ENVELOPE_GCM,
+                                compression=job.get('compression') or COMPRESSION_ZLIB,
+                                **({'scatter': True} if scatter else {}))
+        else:
+            raise ValueError("Job needs a 'message' or a 'payload_file'")
+        return {'status': 'ok', 'output': output}
+
+    if output:
+        result = method.load('extract_file')(job['input'], password, output)
+    else:
+        # Video records scattering in its layout frame, so only image and audio extractors take the flag.
+        options = {'scatter': True} if scatter and 'scatter' in method.extract_options else {}
+        result = method.load('extract')(job['input'], password, **options)
+    return {'status': 'failed' if result.startswith(EXTRACT_FAILURES) else 'ok', 'result': result}
+
+def _error_record(index, job, error):
+    return {'index': index, 'action': job.get('action'), 'file_type': job.get('file_type'),
+            'method': job.get('method'), 'input': job.get('input'), 'status': 'error',
+            'error': f"{type(error).__name__}: {error}"}
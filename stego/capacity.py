@@ -0,0 +1,140 @@
+import os
+import wave
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from stego.registry import available_methods, get_method
+from utils.crypto import encrypted_size, ENVELOPE_GCM
+from utils.payload import HEADER_BITS
+from utils.png_strips import png_size
+
+# Capacity is computed from container headers only: image size, WAV parameters and video
+# frame count/dimensions. No pixel, sample or frame data is decoded.
+
+FILE_EXTENSIONS = {
+    'image': ('.png', '.bmp', '.tif', '.tiff', '.jpg', '.jpeg', '.webp'),
+    'audio': ('.wav',),
+    'video': ('.mp4', '.avi', '.mkv', '.mov', '.webm'),
+}
+
+def image_size(image_path: str) -> Tuple[int, int]:
+    # PNG dimensions come straight from IHDR, which also sidesteps Pillow's decompression-bomb
+    # check on gigapixel carriers that the band-wise engines can handle.
+    size = png_size(image_path)
+    if size is not None:
+        return size
+    from PIL import Image
+    with Image.open(image_path) as img:
+        return img.size
+
+def image_lsb_bits(image_path: str) -> int:
+    width, height = image_size(image_path)
+    return (width * height * 3) // 8 * 8
+
+def image_dct_bits(image_path: str) -> int:
+    from stego.image_stego import DCT_BLOCK_SIZE
+    width, height = image_size(image_path)
+    return (width // DCT_BLOCK_SIZE) * (height // DCT_BLOCK_SIZE)
+
+def audio_lsb_bits(audio_path: str) -> int:
+    with wave.open(audio_path, 'rb') as wav:
+        if wav.getsampwidth() not in (1, 2):
+            raise ValueError("Unsupported sample width")
+        return wav.getnframes() * wav.getnchannels()
+
+def audio_echo_bits(audio_path: str) -> int:
+    from stego.audio_stego import ECHO_SEGMENT_SECONDS
+    with wave.open(audio_path, 'rb') as wav:
+        return wav.getnframes() // int(wav.getframerate() * ECHO_SEGMENT_SECONDS)
+
+def video_lsb_bits(video_path: str, start_frame: int = 10) -> int:
+    import cv2
+    from stego.video_stego import _frame_capacity
+    
+    vidcap = cv2.VideoCapture(video_path)
+    try:
+        if not vidcap.isOpened():
+            raise ValueError(f"Could not open video file: {video_path}")
+        width = int(vidcap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(vidcap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        vidcap.release()
+    
+    # Frame 1 holds the layout metadata; the payload runs from start_frame to the end.
+    return _frame_capacity(width * height) * max(0, total_frames - start_frame + 1)
+
+def max_message_bytes(carrier_bits: int, envelope: str = ENVELOPE_GCM) -> int:
+    # Largest message whose encrypted, uncompressed container fits in `carrier_bits`.
+    available = (carrier_bits - HEADER_BITS) // 8
+    low, high = 0, max(available, 0)
+    if encrypted_size(0, envelope) > available:
+        return 0
+    while low < high:
+        middle = (low + high + 1) // 2
+        if encrypted_size(middle, envelope) <= available:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def embedded_bits(message_bytes: int, envelope: str = ENVELOPE_GCM) -> int:
+    return HEADER_BITS + 8 * encrypted_size(message_bytes, envelope)
+
+def carrier_capacity(path: str, file_type: str, method: str, envelope: str = ENVELOPE_GCM,
+                     message_bytes: Optional[int] = None) -> Dict:
+    spec = get_method(file_type, method)
+    if spec is None:
+        raise ValueError(f"Unsupported method '{method}' for {file_type} steganography")
+    if spec.capacity is None:
+        raise ValueError(f"{file_type} {method} does not report its capacity")
+    
+    carrier_bits = spec.load('capacity')(path)
+    report = {'path': path, 'file_type': file_type, 'method': method, 'carrier_bits': carrier_bits,
+              'max_message_bytes': max_message_bytes(carrier_bits, envelope)}
+    
+    if message_bytes is not None:
+        needed = embedded_bits(message_bytes, envelope)
+        report.update(message_bytes=message_bytes,
+                      encryption_overhead_bytes=encrypted_size(message_bytes, envelope) - message_bytes,
+                      embedded_bits=needed, fits=needed <= carrier_bits)
+    return report
+
+def scan_capacity(paths: Iterable[str], file_type: Optional[str] = None, method: Optional[str] = None,
+                  envelope: str = ENVELOPE_GCM, message_bytes: Optional[int] = None) -> Iterator[Dict]:
+    # Yields one report per (file, method). Directories are walked and filtered by extension;
+    # files that cannot be read produce a report with an 'error' key instead.
+    for path in _iter_carriers(paths, file_type):
+        path_type = file_type or _guess_file_type(path)
+        if path_type is None:
+            yield {'path': path, 'error': "Unknown file type; pass --file-type"}
+            continue
+        
+        if method:
+            methods = [method]
+        else:
+            methods = [name for _, name in available_methods(path_type) if get_method(path_type, name).capacity]
+        
+        for name in methods:
+            try:
+                yield carrier_capacity(path, path_type, name, envelope, message_bytes)
+            except Exception as e:
+                yield {'path': path, 'file_type': path_type, 'method': name, 'error': str(e)}
+
+def _guess_file_type(path):
+    extension = os.path.splitext(path)[1].lower()
+    for file_type, extensions in FILE_EXTENSIONS.items():
+        if extension in extensions:
+            return file_type
+    return None
+
+def _iter_carriers(paths, file_type):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                candidate = os.path.join(root, name)
+                guessed = _guess_file_type(candidate)
+                if guessed is not None and (file_type is None or guessed == file_type):
+                    yield candidate
@@ -1,159 +1,386 @@
-import cv2
 import numpy as np
+from typing import Optional, Tuple
 from PIL import Image
-from scipy.fft import dct, idct
-from utils.crypto import text_to_binary, binary_to_text, encrypt, decrypt
-
-def hide_message_in_image_lsb(image_path: str, message: str, password: str, output_path: str) -> None:
-    encrypted_message = encrypt(message, password)
-    binary_message = text_to_binary(encrypted_message)
-    binary_message += '1111111111111110'
-    
-    img = Image.open(image_path)
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
-    width, height = img.size
-    pixels = img.load()
-    
-    max_bytes = (width * height * 3) // 8
-    if len(binary_message) > max_bytes * 8:
-        raise ValueError(f"Message too large to hide in this image. Max size: {max_bytes} bytes")
-    
-    idx = 0
-    for y in range(height):
-        for x in range(width):
-            if idx < len(binary_message):
-                r, g, b = pixels[x, y]
-                
-                if idx < len(binary_message):
-                    r = r & ~1 | int(binary_message[idx])
-                    idx += 1
-                
-                if idx < len(binary_message):
-                    g = g & ~1 | int(binary_message[idx])
-                    idx += 1
-                    
-                if idx < len(binary_message):
-                    b = b & ~1 | int(binary_message[idx])
-                    idx += 1
-                
-                pixels[x, y] = (r, g, b)
-    
-    img.save(output_path, 'PNG')
+from utils import profiling
+from utils.compression import compress_payload, COMPRESSION_ZLIB
+from utils.crypto import encrypt_bytes, decrypt_payload, ENVELOPE_GCM
+from utils.png_strips import open_png_strips, png_metadata_from_info, PngStripReader, PngStripWriter, PNG_RGB
+from utils.progress import CancelToken, Progress, ProgressCallback, track_bits
+from utils.scatter import scatter_key, scatter_layout, band_slice, ScatterBitReader, ScatterPermutation
+from utils.payload import (container_bits, read_container_with_flags, compression_flags, flags_compression,
+                           StreamBitReader, METHOD_IMAGE_LSB, METHOD_IMAGE_DCT)
+
+DCT_BLOCK_SIZE = 8
+
+# Images are processed in bands of rows holding about IMAGE_BAND_BYTES of RGB pixels (whole 8-row
+# block rows for DCT). PNG carriers are read and written band by band, so memory follows the band
+# size rather than the image size; other formats are decoded whole and then processed the same way.
+IMAGE_BAND_BYTES = 1 << 21
+
+# The PNG compression levels Pillow (LSB) and OpenCV (DCT) used when they wrote whole images.
+LSB_PNG_COMPRESS_LEVEL = 6
+DCT_PNG_COMPRESS_LEVEL = 1
+
+# cv2 and scipy.fft are only needed by the DCT method and are imported on first use, so that
+# LSB-only callers do not pay for them at startup.
+
+def hide_message_in_image_lsb(image_path: str, message: str, password: str, output_path: str,
+                              envelope: str = ENVELOPE_GCM, compression: str = COMPRESSION_ZLIB, scatter: bool = False,
+                              progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> None:
+    tracker = Progress(progress, cancel, unit='rows')
+    compressed_message, codec_id = compress_payload(message.encode(), compression)
+    encrypted_message = encrypt_bytes(compressed_message, password, envelope)
+    bits = container_bits(encrypted_message, METHOD_IMAGE_LSB, compression_flags(codec_id))
+
+    with _open_image_bands(image_path, _decode_rgb_pil) as source:
+        width, height = source.width, source.height
+
+        max_bytes = (width * height * 3) // 8
+        if len(bits) > max_bytes * 8:
+            raise ValueError(f"Message too large to hide in this image. Max size: {max_bytes} bytes")
+        profiling.count_file_size('bytes_read', image_path)
+        profiling.count('pixels', width * height)
+
+        # Bits fill the pixels in row-major order, three per pixel, or scattered over all of them.
+        row_bits = width * 3
+        if scatter:
+            positions, bits = scatter_layout(bits, ScatterPermutation(scatter_key(password), width * height * 3))
+            payload_rows = int(positions[-1]) // row_bits + 1
+        else:
+            positions, payload_rows = None, -(-len(bits) // row_bits)
+
+        def embed(first_row, band):
+            start = first_row * row_bits
+            flat = band.reshape(-1)
+            if positions is None:
+                count = min(len(flat), len(bits) - start)
+                flat[:count] = (flat[:count] & 0xFE) | bits[start:start + count]
+            else:
+                chosen = band_slice(positions, start, start + len(flat))
+                slots = positions[chosen] - start
+                flat[slots] = (flat[slots] & 0xFE) | bits[chosen]
+
+        with PngStripWriter(output_path, width, height, LSB_PNG_COMPRESS_LEVEL, source.metadata) as sink:
+            _rewrite_bands(source, sink, payload_rows, _band_rows(width), embed, tracker)
+
+    profiling.count_file_size('bytes_written', output_path)
+    tracker.finish()
     print(f"Message successfully hidden in {output_path}")
 
-def extract_message_from_image_lsb(image_path: str, password: str) -> str:
+def extract_message_from_image_lsb(image_path: str, password: str, scatter: bool = False,
+                                   progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> str:
+    tracker = Progress(progress, cancel, unit='rows')
+
+    with _open_image_bands(image_path, _decode_rgb_pil) as source:
+        profiling.count_file_size('bytes_read', image_path)
+        profiling.count('pixels', source.width * source.height)
+
+        if scatter:
+            band_rows = _band_rows(source.width)
+            with _BandGather(image_path, source, band_rows, band_rows * source.width * 3,
+                             lambda band, slots: band.reshape(-1)[slots] & 1, tracker) as gather:
+                read_bits = ScatterBitReader(gather, ScatterPermutation(scatter_key(password), source.width * source.height * 3))
+                return _extract_container(read_bits, METHOD_IMAGE_LSB, password, tracker, legacy_fallback=False)
+
+        # Bands are decoded only as far as the payload reaches.
+        read_bits = StreamBitReader(_lsb_band_bits(source))
+        return _extract_container(track_bits(read_bits, tracker, source.width * 3), METHOD_IMAGE_LSB, password, tracker)
+
+def hide_message_in_image_dct(image_path: str, message: str, password: str, output_path: str,
+                             strength: float = 25.0, coefficient: Tuple[int, int] = (4, 5),
+                             envelope: str = ENVELOPE_GCM, compression: str = COMPRESSION_ZLIB, scatter: bool = False,
+                             progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> None:
+    _check_dct_coefficient(coefficient)
+    tracker = Progress(progress, cancel, unit='rows')
+
+    compressed_message, codec_id = compress_payload(message.encode(), compression)
+    encrypted_message = encrypt_bytes(compressed_message, password, envelope)
+    bits = container_bits(encrypted_message, METHOD_IMAGE_DCT, compression_flags(codec_id))
+
+    with _open_image_bands(image_path, _decode_rgb_cv2) as source:
+        width, height = source.width, source.height
+
+        blocks_w = width // DCT_BLOCK_SIZE
+        max_message_bits = (height // DCT_BLOCK_SIZE) * blocks_w
+        if len(bits) > max_message_bits:
+            raise ValueError(f"Message too large to hide in this image. Max size: {max_message_bits // 8} bytes")
+        profiling.count_file_size('bytes_read', image_path)
+        profiling.count('pixels', width * height)
+
+        # One bit per 8x8 block, block rows top to bottom, or scattered over all blocks.
+        if scatter:
+            positions, bits = scatter_layout(bits, ScatterPermutation(scatter_key(password), max_message_bits))
+            last_block = int(positions[-1])
+        else:
+            positions, last_block = None, len(bits) - 1
+        payload_rows = (last_block // blocks_w + 1) * DCT_BLOCK_SIZE
+
+        def embed(first_row, band):
+            rows = min(len(band), payload_rows - first_row)
+            first_block = first_row // DCT_BLOCK_SIZE * blocks_w
+            stop_block = first_block + rows // DCT_BLOCK_SIZE * blocks_w
+            if positions is None:
+                band_bits = bits[first_block:stop_block]
+                block_index = np.arange(len(band_bits))
+            else:
+                chosen = band_slice(positions, first_block, stop_block)
+                band_bits, block_index = bits[chosen], positions[chosen] - first_block
+            _embed_dct_rows(band[:rows], block_index, band_bits, strength, coefficient)
+
+        if output_path.lower().endswith('.png'):
+            sink = PngStripWriter(output_path, width, height, DCT_PNG_COMPRESS_LEVEL, source.metadata)
+        else:
+            sink = _ImageFileSink(output_path, width, height, getattr(source, 'image', None))
+        with sink:
+            _rewrite_bands(source, sink, payload_rows, _band_rows(width, DCT_BLOCK_SIZE), embed, tracker)
+
+    profiling.count_file_size('bytes_written', output_path)
+    tracker.finish()
+    print(f"Message successfully hidden in {output_path} using DCT method")
+
+def extract_message_from_image_dct(image_path: str, password: str, threshold: float = 0,
+                                   coefficient: Tuple[int, int] = (4, 5), scatter: bool = False,
+                                   progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> str:
+    _check_dct_coefficient(coefficient)
+    tracker = Progress(progress, cancel, unit='block rows')
+
+    with _open_image_bands(image_path, _decode_rgb_cv2) as source:
+        profiling.count_file_size('bytes_read', image_path)
+        profiling.count('pixels', source.width * source.height)
+
+        if scatter:
+            band_rows = _band_rows(source.width, DCT_BLOCK_SIZE)
+            blocks_w = source.width // DCT_BLOCK_SIZE
+            read_blocks = lambda band, block_index: _read_dct_blocks(band, block_index, threshold, coefficient)
+            with _BandGather(image_path, source, band_rows, band_rows // DCT_BLOCK_SIZE * blocks_w, read_blocks, tracker) as gather:
+                permutation = ScatterPermutation(scatter_key(password), (source.height // DCT_BLOCK_SIZE) * blocks_w)
+                return _extract_container(ScatterBitReader(gather, permutation), METHOD_IMAGE_DCT, password, tracker,
+                                          legacy_fallback=False)
+
+        read_bits = StreamBitReader(_dct_band_bits(source, threshold, coefficient))
+        blocks_w = max(source.width // DCT_BLOCK_SIZE, 1)
+        return _extract_container(track_bits(read_bits, tracker, blocks_w), METHOD_IMAGE_DCT, password, tracker)
+
+def _extract_container(read_bits, method, password, tracker, legacy_fallback=True):
+    try:
+        with profiling.span('image.extract'):
+            found = read_container_with_flags(read_bits, method, legacy_fallback=legacy_fallback)
+        tracker.finish()
+        if found is None:
+            return "No hidden message found"
+        encrypted_message, flags = found
+        return decrypt_payload(encrypted_message, password, flags_compression(flags))
+    except Exception as e:
+        return f"Failed to extract message: {str(e)}"
+
+def _check_dct_coefficient(coefficient):
+    u, v = coefficient
+    if not (0 <= u < DCT_BLOCK_SIZE and 0 <= v < DCT_BLOCK_SIZE):
+        raise ValueError(f"DCT coefficient must lie inside an {DCT_BLOCK_SIZE}x{DCT_BLOCK_SIZE} block, got {coefficient}")
+
+def _dct_blocks(y_channel):
+    # (blocks_h, blocks_w, 8, 8) view over the Y channel; writes go straight through to it.
+    blocks_h = y_channel.shape[0] // DCT_BLOCK_SIZE
+    blocks_w = y_channel.shape[1] // DCT_BLOCK_SIZE
+    cropped = y_channel[:blocks_h * DCT_BLOCK_SIZE, :blocks_w * DCT_BLOCK_SIZE]
+    return cropped.reshape(blocks_h, DCT_BLOCK_SIZE, blocks_w, DCT_BLOCK_SIZE).swapaxes(1, 2)
+
+def _embed_dct_rows(rgb, block_index, bits, strength, coefficient):
+    # Embeds `bits` into the blocks of `rgb` (a whole number of block rows) numbered row-major by
+    # `block_index`, in place. Other blocks are left as they are.
+    import cv2
+    from scipy.fft import dctn, idctn
+
+    if len(bits) == 0:
+        return
+    img_ycrcb = cv2.cvtColor(rgb, cv2.COLOR_RGB2YCrCb)
+    y_channel = img_ycrcb[:,:,0].astype(float)
+    blocks = _dct_blocks(y_channel)
+
+    block_rows, block_cols = np.divmod(block_index, blocks.shape[1])
+    block_dct = dctn(blocks[block_rows, block_cols], axes=(1, 2))
+
+    u, v = coefficient
+    magnitude = np.abs(block_dct[:, u, v]) + strength
+    block_dct[:, u, v] = np.where(bits == 1, magnitude, -magnitude)
+
+    blocks[block_rows, block_cols] = idctn(block_dct, axes=(1, 2))
+
+    img_ycrcb[:,:,0] = np.clip(y_channel, 0, 255).astype(np.uint8)
+    rgb[:] = cv2.cvtColor(img_ycrcb, cv2.COLOR_YCrCb2RGB)
+
+def _read_dct_blocks(rgb, block_index, threshold, coefficient):
+    import cv2
+    from scipy.fft import dctn
+
+    blocks = _dct_blocks(cv2.cvtColor(rgb, cv2.COLOR_RGB2YCrCb)[:,:,0].astype(float))
+    block_rows, block_cols = np.divmod(block_index, blocks.shape[1])
+    u, v = coefficient
+    return (dctn(blocks[block_rows, block_cols], axes=(1, 2))[:, u, v] > threshold).astype(np.uint8)
+
+def _lsb_band_bits(source):
+    band_rows = _band_rows(source.width)
+    for row in range(0, source.height, band_rows):
+        with profiling.span('image.decode'):
+            band = source.read_rows(min(band_rows, source.height - row))
+        yield band.reshape(-1) & 1
+
+def _dct_band_bits(source, threshold, coefficient):
+    import cv2
+    from scipy.fft import dctn
+
+    band_rows = _band_rows(source.width, DCT_BLOCK_SIZE)
+    u, v = coefficient
+    for row in range(0, source.height, band_rows):
+        with profiling.span('image.decode'):
+            band = source.read_rows(min(band_rows, source.height - row))
+        blocks = _dct_blocks(cv2.cvtColor(band, cv2.COLOR_RGB2YCrCb)[:,:,0].astype(float))
+        if blocks.size == 0:
+            return
+        block_dct = dctn(blocks.reshape(-1, DCT_BLOCK_SIZE, DCT_BLOCK_SIZE), axes=(1, 2))
+        yield (block_dct[:, u, v] > threshold).astype(np.uint8)
+
+def _band_rows(width, multiple=1):
+    rows = max(IMAGE_BAND_BYTES // (width * 3), 1)
+    return max(rows - rows % multiple, multiple)
+
+def _rewrite_bands(source, sink, payload_rows, band_rows, embed, tracker):
+    # Passes every band from `source` to `sink`, calling embed(first_row, band) on the bands that hold
+    # payload rows. For an RGB PNG written back as PNG, rows after the payload are copied still filtered:
+    # only the first of them is decoded and re-filtered, since its filter refers to the modified row above.
+    copy_filtered = (isinstance(source, PngStripReader) and source.color_type == PNG_RGB
+                     and isinstance(sink, PngStripWriter))
+    decode_rows = min(payload_rows + 1, source.height) if copy_filtered else source.height
+    tracker.total = source.height
+
+    row = 0
+    while row < decode_rows:
+        rows = min(band_rows, decode_rows - row)
+        with profiling.span('image.decode'):
+            band = source.read_rows(rows)
+        if row < payload_rows:
+            with profiling.span('image.embed'):
+                embed(row, band)
+        with profiling.span('image.encode'):
+            sink.write_rows(band)
+        row += rows
+        tracker.update(row)
+
+    while row < source.height:
+        rows = min(band_rows, source.height - row)
+        with profiling.span('image.copy'):
+            sink.write_filtered(source.read_filtered(rows), rows)
+        row += rows
+        tracker.update(row)
+
+class _BandGather:
+    # gather() for ScatterBitReader over a band source: read_slots(band, slots) returns the bits at a band's
+    # sorted local slots. Band sources only move forward, so every read after the first makes a new pass,
+    # which stops at the band holding the last requested slot.
+    def __init__(self, image_path, source, band_rows, slots_per_band, read_slots, tracker):
+        self.image_path = image_path
+        self.source = source
+        self.band_rows = band_rows
+        self.slots_per_band = slots_per_band
+        self.read_slots = read_slots
+        self.tracker = tracker
+        # One pass for the payload header and one for the payload.
+        tracker.total = 2 * source.height
+
+    def __call__(self, positions):
+        if self.source.rows_read:
+            self.source = _rewind_bands(self.source, self.image_path)
+        source = self.source
+        values = []
+        first_slot = 0
+        while len(positions) and first_slot <= positions[-1] and source.rows_read < source.height:
+            rows = min(self.band_rows, source.height - source.rows_read)
+            with profiling.span('image.decode'):
+                band = source.read_rows(rows)
+            chosen = band_slice(positions, first_slot, first_slot + self.slots_per_band)
+            if chosen.stop > chosen.start:
+                values.append(self.read_slots(band, positions[chosen] - first_slot))
+            first_slot += self.slots_per_band
+            self.tracker.advance(rows)
+        return np.concatenate(values) if values else np.zeros(0, dtype=np.uint8)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.source.close()
+        return False
+
+def _rewind_bands(source, image_path):
+    if isinstance(source, _ArrayBands):
+        source.rows_read = 0
+        return source
+    source.close()
+    return PngStripReader(image_path)
+
+def _open_image_bands(image_path, decode_whole):
+    bands = open_png_strips(image_path)
+    if bands is not None:
+        return bands
+    with profiling.span('image.decode'):
+        return decode_whole(image_path)
+
+def _decode_rgb_pil(image_path):
     img = Image.open(image_path)
+    # Pillow carried the ICC profile over when it saved this image; dpi and PNG text are kept as well.
+    metadata = png_metadata_from_info(img.info, getattr(img, 'text', None))
     if img.mode != 'RGB':
         img = img.convert('RGB')
-    width, height = img.size
-    pixels = img.load()
-    
-    binary_message = ''
-    delimiter = '1111111111111110'
-    
-    for y in range(height):
-        for x in range(width):
-            r, g, b = pixels[x, y]
-            
-            binary_message += str(r & 1)
-            binary_message += str(g & 1)
-            binary_message += str(b & 1)
-            
-            if len(binary_message) >= len(delimiter) and binary_message[-len(delimiter):] == delimiter:
-                binary_message = binary_message[:-len(delimiter)]
-                try:
-                    padding = 8 - (len(binary_message) % 8) if len(binary_message) % 8 != 0 else 0
-                    binary_message += '0' * padding
-                    encrypted_message = binary_to_text(binary_message)
-                    return decrypt(encrypted_message, password)
-                except Exception as e:
-                    return f"Failed to extract message: {str(e)}"
-    
-    return "No hidden message found"
-
-def hide_message_in_image_dct(image_path: str, message: str, password: str, output_path: str, 
-                             strength: float = 25.0) -> None:
-    encrypted_message = encrypt(message, password)
-    binary_message = text_to_binary(encrypted_message) + '1111111111111110'
-    
-    img = cv2.imread(image_path, cv2.IMREAD_COLOR)
-    if img is None:
-        raise ValueError(f"Could not read image {image_path}")
-    
-    img_ycrcb = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)
-    
-    y_channel = img_ycrcb[:,:,0].astype(float)
-    height, width = y_channel.shape
-    
-    block_size = 8
-    blocks_h = height // block_size
-    blocks_w = width // block_size
-    max_message_bits = blocks_h * blocks_w
-    
-    if len(binary_message) > max_message_bits:
-        raise ValueError(f"Message too large to hide in this image. Max size: {max_message_bits // 8} bytes")
-    
-    message_index = 0
-    for y in range(0, blocks_h * block_size, block_size):
-        for x in range(0, blocks_w * block_size, block_size):
-            if message_index < len(binary_message):
-                block = y_channel[y:y+block_size, x:x+block_size]
-                
-                block_dct = dct(dct(block, axis=0), axis=1)
-                
-                bit = int(binary_message[message_index])
-                if bit == 1:
-                    block_dct[4, 5] = abs(block_dct[4, 5]) + strength
-                else:
-                    block_dct[4, 5] = -abs(block_dct[4, 5]) - strength
-                
-                block = idct(idct(block_dct, axis=1), axis=0)
-                
-                y_channel[y:y+block_size, x:x+block_size] = block
-                message_index += 1
-    
-    img_ycrcb[:,:,0] = np.clip(y_channel, 0, 255).astype(np.uint8)
-    
-    stego_img = cv2.cvtColor(img_ycrcb, cv2.COLOR_YCrCb2BGR)
-    
-    cv2.imwrite(output_path, stego_img, [cv2.IMWRITE_JPEG_QUALITY, 100])
-    print(f"Message successfully hidden in {output_path} using DCT method")
+    return _ArrayBands(np.array(img, dtype=np.uint8), metadata)
+
+def _decode_rgb_cv2(image_path):
+    import cv2
 
-def extract_message_from_image_dct(image_path: str, password: str, threshold: float = 0) -> str:
     img = cv2.imread(image_path, cv2.IMREAD_COLOR)
     if img is None:
         raise ValueError(f"Could not read image {image_path}")
-    
-    img_ycrcb = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)
-    
-    y_channel = img_ycrcb[:,:,0].astype(float)
-    height, width = y_channel.shape
-    
-    block_size = 8
-    blocks_h = height // block_size
-    blocks_w = width // block_size
-    
-    binary_message = ''
-    delimiter = '1111111111111110'
-    
-    for y in range(0, blocks_h * block_size, block_size):
-        for x in range(0, blocks_w * block_size, block_size):
-            block = y_channel[y:y+block_size, x:x+block_size]
-            
-            block_dct = dct(dct(block, axis=0), axis=1)
-            
-            bit = '1' if block_dct[4, 5] > threshold else '0'
-            binary_message += bit
-            
-            if len(binary_message) >= len(delimiter) and binary_message[-len(delimiter):] == delimiter:
-                binary_message = binary_message[:-len(delimiter)]
-                try:
-                    padding = 8 - (len(binary_message) % 8) if len(binary_message) % 8 != 0 else 0
-                    binary_message += '0' * padding
-                    encrypted_message = binary_to_text(binary_message)
-                    return decrypt(encrypted_message, password)
-                except Exception as e:
-                    return f"Failed to extract message: {str(e)}"
-    
-    return "No hidden message found"
\ No newline at end of file
+    return _ArrayBands(cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img))
+
+class _ArrayBands:
+    # PngStripReader's band interface over an image in a format that has to be decoded whole.
+    def __init__(self, image, metadata=()):
+        self.image = image
+        self.height, self.width = image.shape[:2]
+        self.metadata = metadata
+        self.rows_read = 0
+
+    def read_rows(self, rows):
+        band = self.image[self.rows_read:self.rows_read + rows]
+        self.rows_read += rows
+        return band
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class _ImageFileSink:
+    # Collects bands into a whole image for formats only OpenCV writes, e.g. JPEG. When the source was
+    # decoded whole, its array is reused so the image is not held twice.
+    def __init__(self, path, width, height, image=None):
+        self.path = path
+        self.image = image if image is not None else np.empty((height, width, 3), dtype=np.uint8)
+        self._row = 0
+
+    def write_rows(self, band):
+        self.image[self._row:self._row + len(band)] = band
+        self._row += len(band)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            import cv2
+            cv2.imwrite(self.path, cv2.cvtColor(self.image, cv2.COLOR_RGB2BGR, dst=self.image),
+                        [cv2.IMWRITE_JPEG_QUALITY, 100])
+        return False
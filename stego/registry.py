@@ -0,0 +1,93 @@
+import importlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Third-party methods register under this entry point group. The entry point name is
+# "<file_type>.<method>" and its object is a MethodSpec, e.g. in pyproject.toml:
+#   [project.entry-points."stego.methods"]
+#   "image.palette" = "stego_palette:METHOD"
+# Entry points are only looked up when a method is not built in, and only the matching one is loaded.
+ENTRY_POINT_GROUP = 'stego.methods'
+
+FILE_TYPES = ('image', 'audio', 'video')
+
+
+class MethodSpec(NamedTuple):
+    # Engine functions as "module:function" targets, imported on first use.
+    # hide(input_path, message, password, output_path, envelope=..., compression=..., **options)
+    # extract(input_path, password) -> str
+    # hide_file(input_path, payload_path, password, output_path)
+    # extract_file(input_path, password, output_path) -> str
+    # Built-in engines also take progress= and cancel= keywords on all four (see utils.progress).
+    hide: str
+    extract: str
+    hide_file: Optional[str] = None
+    extract_file: Optional[str] = None
+    # Extra CLI options forwarded to hide() and extract() as keyword arguments.
+    hide_options: Tuple[str, ...] = ()
+    extract_options: Tuple[str, ...] = ()
+    # Backend modules the engine imports on first use; long-running workers import them up front.
+    preload: Tuple[str, ...] = ()
+    # capacity(input_path) -> carrier bits available to the payload container, read from headers only.
+    capacity: Optional[str] = None
+
+    def load(self, entry: str) -> Callable:
+        target = getattr(self, entry)
+        if target is None:
+            raise ValueError(f"This method does not provide '{entry}'")
+        module_name, _, attribute = target.partition(':')
+        return getattr(importlib.import_module(module_name), attribute)
+
+_methods: Dict[Tuple[str, str], MethodSpec] = {}
+_entry_points_loaded = False
+
+def register_method(file_type: str, method: str, spec: MethodSpec) -> None:
+    _methods[(file_type, method.lower())] = spec
+
+def get_method(file_type: str, method: str) -> Optional[MethodSpec]:
+    key = (file_type, method.lower())
+    if key not in _methods:
+        _load_entry_points(f"{file_type}.{method.lower()}")
+    return _methods.get(key)
+
+def available_methods(file_type: Optional[str] = None) -> List[Tuple[str, str]]:
+    _load_entry_points()
+    return sorted(key for key in _methods if file_type is None or key[0] == file_type)
+
+def _load_entry_points(name: Optional[str] = None) -> None:
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    
+    from importlib.metadata import entry_points
+    try:
+        candidates = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python < 3.10
+        candidates = entry_points().get(ENTRY_POINT_GROUP, [])
+    
+    for entry_point in candidates:
+        if name is not None and entry_point.name.lower() != name:
+            continue
+        file_type, _, method = entry_point.name.partition('.')
+        _methods.setdefault((file_type, method.lower()), entry_point.load())
+    
+    if name is None:
+        _entry_points_loaded = True
+
+register_method('image', 'lsb', MethodSpec(
+    'stego.image_stego:hide_message_in_image_lsb', 'stego.image_stego:extract_message_from_image_lsb',
+    hide_options=('scatter',), extract_options=('scatter',), capacity='stego.capacity:image_lsb_bits'))
+register_method('image', 'dct', MethodSpec(
+    'stego.image_stego:hide_message_in_image_dct', 'stego.image_stego:extract_message_from_image_dct',
+    hide_options=('scatter',), extract_options=('scatter',), preload=('cv2', 'scipy.fft'), capacity='stego.capacity:image_dct_bits'))
+register_method('audio', 'lsb', MethodSpec(
+    'stego.audio_stego:hide_message_in_audio_lsb', 'stego.audio_stego:extract_message_from_audio_lsb',
+    'stego.audio_stego:hide_file_in_audio_lsb', 'stego.audio_stego:extract_file_from_audio_lsb',
+    hide_options=('scatter',), extract_options=('scatter',), capacity='stego.capacity:audio_lsb_bits'))
+register_method('audio', 'echo', MethodSpec(
+    'stego.audio_stego:hide_message_in_audio_echo', 'stego.audio_stego:extract_message_from_audio_echo',
+    preload=('scipy.io.wavfile',), capacity='stego.capacity:audio_echo_bits'))
+register_method('video', 'lsb', MethodSpec(
+    'stego.video_stego:hide_message_in_video', 'stego.video_stego:extract_message_from_video',
+    'stego.video_stego:hide_file_in_video', 'stego.video_stego:extract_file_from_video',
+    hide_options=('workers', 'scatter'), capacity='stego.capacity:video_lsb_bits'))
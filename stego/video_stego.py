@@ -1,37 +1,84 @@
 import cv2
+import imageio_ffmpeg
+import multiprocessing
 import os
-import unicodedata
-from utils.crypto import encrypt, decrypt
-from moviepy.video.io.VideoFileClip import VideoFileClip
-from moviepy.audio.io.AudioFileClip import AudioFileClip
+import queue
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait
+from functools import lru_cache
+from typing import Optional
+from utils import profiling
+from utils.compression import compress_payload, COMPRESSION_ZLIB
+from utils.crypto import (encrypt_bytes, decrypt_payload, encrypt_stream, decrypt_stream_to_file, stream_ciphertext_size,
+                          ENVELOPE_GCM, DEFAULT_STREAM_CHUNK_SIZE)
+from utils.progress import (CancelToken, Progress, ProgressCallback, track_bits,
+                            PROGRESS_INTERVAL)
+from utils.scatter import scatter_key, scatter_layout, band_slice, ScatterBitReader, ScatterPermutation
+from utils.payload import (bytes_to_bits, bits_to_bytes, container_bits, read_container_with_flags, read_container_stream,
+                           stream_container_bits, StreamBitReader, compression_flags, flags_compression, HEADER_BITS,
+                           METHOD_VIDEO_LSB)
 
-def hide_message_in_video(video_path: str, message: str, password: str, output_path: str = None) -> str:
+VIDEO_METADATA_MAGIC = b'STGV'
+VIDEO_METADATA_FORMAT = '>4sII'
+VIDEO_METADATA_BITS = struct.calcsize(VIDEO_METADATA_FORMAT) * 8
+# Layout of payloads scattered with a password-derived key; also records how many frames they span.
+VIDEO_SCATTER_MAGIC = b'STGS'
+VIDEO_SCATTER_FORMAT = '>4sIII'
+VIDEO_SCATTER_METADATA_BITS = struct.calcsize(VIDEO_SCATTER_FORMAT) * 8
+
+def hide_message_in_video(video_path: str, message: str, password: str, output_path: str = None,
+                          stats: Optional["PipelineStats"] = None, start_frame: int = 10,
+                          bits_per_frame: Optional[int] = None, workers: int = 1,
+                          envelope: str = ENVELOPE_GCM, compression: str = COMPRESSION_ZLIB, scatter: bool = False,
+                          progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> str:
     if not os.path.exists(video_path):
         raise FileNotFoundError(f"Video file not found: {video_path}")
     
-    if not output_path:
-        output_path = "video_steganography.avi"
-    
-    encrypted_message = encrypt(message, password)
+    compressed_message, codec_id = compress_payload(message.encode(), compression)
+    encrypted_message = encrypt_bytes(compressed_message, password, envelope)
+    bits = container_bits(encrypted_message, METHOD_VIDEO_LSB, compression_flags(codec_id))
     
-    encrypted_message = unicodedata.normalize('NFKD', encrypted_message).encode('ascii', 'ignore').decode('ascii')
+    output_path = _hide_bits_in_video(video_path, [bits], len(bits), output_path, stats,
+                                      start_frame, bits_per_frame, workers, Progress(progress, cancel, unit='frames'),
+                                      scatter_key(password) if scatter else None)
     
-    message_words = [ch for ch in encrypted_message]
+    print(f"Message successfully hidden in {output_path}")
+    return message
+
+def hide_file_in_video(video_path: str, payload_path: str, password: str, output_path: str = None,
+                       stats: Optional["PipelineStats"] = None, start_frame: int = 10,
+                       bits_per_frame: Optional[int] = None, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+                       progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> str:
+    # The file is read, encrypted and embedded chunk by chunk as frames go through the pipeline,
+    # so it is encoded in a single process.
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video file not found: {video_path}")
     
-    start_frame = 10
+    encrypted_size = stream_ciphertext_size(os.path.getsize(payload_path), chunk_size)
     
-    first_delimiter = "^$^"
-    word_delimiter = "^*^"
-    frame_delimiter = "^#^"
+    with open(payload_path, 'rb') as payload:
+        bit_chunks = stream_container_bits(encrypt_stream(payload, password, chunk_size), encrypted_size, METHOD_VIDEO_LSB)
+        output_path = _hide_bits_in_video(video_path, bit_chunks, HEADER_BITS + encrypted_size * 8, output_path,
+                                          stats, start_frame, bits_per_frame, 1, Progress(progress, cancel, unit='frames'))
     
-    metadata = f"{first_delimiter}{start_frame}{word_delimiter}"
+    print(f"File successfully hidden in {output_path}")
+    return output_path
+
+def _hide_bits_in_video(video_path, bit_chunks, total_bits, output_path, stats, start_frame, bits_per_frame, workers, tracker,
+                        key=None):
+    # With a scatter `key`, the bits (a message, so a single chunk) are spread over every frame from
+    # start_frame to the end of the clip instead of packed into the first ones.
+    if not output_path:
+        output_path = "video_steganography.avi"
     
-    prepared_words = []
-    for i, word in enumerate(message_words):
-        if i == len(message_words) - 1:
-            prepared_words.append(word + frame_delimiter)
-        else:
-            prepared_words.append(word + word_delimiter)
+    if start_frame < 2:
+        raise ValueError("start_frame must be at least 2; frame 1 holds the layout metadata")
     
     vidcap = cv2.VideoCapture(video_path)
     
@@ -46,80 +93,197 @@ def hide_message_in_video(video_path: str, message: str, password: str, output_p
         vidcap.release()
         raise ValueError(f"Invalid video dimensions or frame rate. Make sure {video_path} is a valid video file.")
     
+    frame_capacity = _frame_capacity(frame_width * frame_height)
+    if bits_per_frame is None:
+        bits_per_frame = frame_capacity
+    if not 0 < bits_per_frame <= frame_capacity:
+        vidcap.release()
+        raise ValueError(f"bits_per_frame must be between 1 and {frame_capacity} for this video")
+    
     total_frames = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
-    required_frames = start_frame + len(prepared_words)
+    vidcap.release()
+    if key is not None:
+        # Scattered bits can land in any frame up to the last one counted, so that frame has to exist.
+        with profiling.span('video.count_frames'):
+            total_frames = _verified_frame_count(video_path)
+    
+    needed_frames = -(-total_bits // bits_per_frame)
+    required_frames = start_frame + needed_frames - 1
     if total_frames < required_frames:
-        vidcap.release()
         raise ValueError(
             f"Video has only {total_frames} frames but {required_frames} are needed. "
             f"Choose a shorter message or a longer video."
         )
     
-    try:
-        fourcc = cv2.VideoWriter_fourcc(*'FFV1')
-        out = cv2.VideoWriter('stego_TEMP.avi', fourcc, fps=fps, frameSize=(frame_width, frame_height))
-        
-        if not out.isOpened():
-            vidcap.release()
-            raise RuntimeError(
-                "Failed to create output video file. "
-                "Check if the codec is supported and you have write permissions."
-            )
-    except Exception as e:
-        vidcap.release()
-        raise RuntimeError(f"Error creating output video: {str(e)}")
+    if key is None:
+        frame_bits = _FrameBitFeed(StreamBitReader(bit_chunks), start_frame, bits_per_frame, needed_frames)
+    else:
+        payload_frames = total_frames - start_frame + 1
+        positions, bits = scatter_layout(np.concatenate(list(bit_chunks)), ScatterPermutation(key, payload_frames * bits_per_frame))
+        frame_bits = _ScatterFrameFeed(positions, bits, start_frame, bits_per_frame, payload_frames)
+        required_frames = start_frame + int(positions[-1]) // bits_per_frame
+    tracker.total = total_frames
+    
+    frame_size = (frame_width, frame_height)
+    segments = _plan_segments(video_path, total_frames, workers)
+    
+    # Per-job scratch directory so concurrent jobs never share intermediate files.
+    work_dir = tempfile.mkdtemp(prefix='stego_')
+    run_stats = PipelineStats()
     
     try:
-        frame_number = 0
-        frames_processed = 0
-        while vidcap.isOpened():
-            frame_number += 1
-            ret, frame = vidcap.read()
-            
-            if not ret:
-                break
-            
-            frames_processed += 1
-            
-            if frame_number == 1:
-                frame = _lsb_hide_frame(frame, metadata)
-            
-            elif start_frame <= frame_number < start_frame + len(prepared_words):
-                word_index = frame_number - start_frame
-                frame = _lsb_hide_frame(frame, prepared_words[word_index])
+        try:
+            if len(segments) > 1:
+                # Worker processes each need their frames' bits up front.
+                segment_paths, frames_processed = _encode_segments_parallel(
+                    video_path, work_dir, segments, fps, frame_size, dict(frame_bits.items()), workers, run_stats, tracker)
+            else:
+                segment_paths = [os.path.join(work_dir, 'stego.avi')]
+                frames_processed, _ = _encode_segment(
+                    video_path, segment_paths[0], 1, None, fps, frame_size, frame_bits, run_stats, tracker)
             
-            out.write(frame)
+            if frames_processed < required_frames:
+                raise ValueError(
+                    f"Video ended prematurely. Processed {frames_processed} frames but needed {required_frames}."
+                )
+        except Exception as e:
+            raise RuntimeError(f"Error processing video: {str(e)}")
+        finally:
+            cv2.destroyAllWindows()
+            if stats is not None:
+                stats.add(run_stats)
+            _profile_pipeline(run_stats)
+            profiling.count_file_size('bytes_read', video_path)
         
-        if frames_processed < required_frames:
-            raise ValueError(
-                f"Video ended prematurely. Processed {frames_processed} frames but needed {required_frames}."
-            )
+        tracker.check()
+        try:
+            with profiling.span('video.mux'):
+                _combine_video_audio(video_path, segment_paths, output_path)
+            profiling.count_file_size('bytes_written', output_path)
+        except Exception as e:
+            raise RuntimeError(f"Error combining video and audio: {str(e)}")
+    finally:
+        # Also runs on cancellation, so no intermediate segment files outlive the job.
+        shutil.rmtree(work_dir, ignore_errors=True)
     
-    except Exception as e:
-        vidcap.release()
-        out.release()
-        cv2.destroyAllWindows()
-        if os.path.exists('stego_TEMP.avi'):
-            os.remove('stego_TEMP.avi')
-        raise RuntimeError(f"Error processing video: {str(e)}")
+    tracker.finish()
+    return output_path
+
+def _profile_pipeline(stats):
+    # Stage seconds are busy time summed over the reader, embed and writer threads (and segment
+    # workers), so together they can exceed the wall time of the run.
+    for name in ('decode', 'embed', 'encode'):
+        stage = getattr(stats, name)
+        profiling.add_time(f'video.{name}', stage.seconds, stage.frames)
+    profiling.count('frames', stats.decode.frames)
+
+class _FrameBitFeed:
+    # Maps 1-based frame numbers to the bits they carry, reading payload bits on demand from a
+    # forward-only bit reader. Frames must be requested in increasing order.
+    def __init__(self, read_bits, start_frame, bits_per_frame, payload_frames):
+        self._read_bits = read_bits
+        self._metadata = _video_metadata_bits(start_frame, bits_per_frame)
+        self.start_frame = start_frame
+        self.bits_per_frame = bits_per_frame
+        self.payload_frames = payload_frames
+    
+    def get(self, frame_number):
+        if frame_number == 1:
+            return self._metadata
+        index = frame_number - self.start_frame
+        if not 0 <= index < self.payload_frames:
+            return None
+        return self._read_bits(index * self.bits_per_frame, self.bits_per_frame)
+    
+    def items(self):
+        for frame_number in [1, *range(self.start_frame, self.start_frame + self.payload_frames)]:
+            yield frame_number, self.get(frame_number)
+
+class _ScatterFrameFeed:
+    # _FrameBitFeed for scattered payloads: maps frame numbers to (slots, bits), the sorted positions
+    # that fall among a frame's first bits_per_frame LSB slots and the bits that go there.
+    def __init__(self, positions, bits, start_frame, bits_per_frame, payload_frames):
+        self._positions = positions
+        self._bits = bits
+        self._metadata = _video_metadata_bits(start_frame, bits_per_frame, payload_frames)
+        self.start_frame = start_frame
+        self.bits_per_frame = bits_per_frame
+        self.payload_frames = payload_frames
+    
+    def get(self, frame_number):
+        if frame_number == 1:
+            return self._metadata
+        index = frame_number - self.start_frame
+        if not 0 <= index < self.payload_frames:
+            return None
+        first_slot = index * self.bits_per_frame
+        chosen = band_slice(self._positions, first_slot, first_slot + self.bits_per_frame)
+        if chosen.start == chosen.stop:
+            return None
+        return self._positions[chosen] - first_slot, self._bits[chosen]
+    
+    def items(self):
+        for frame_number in [1, *range(self.start_frame, self.start_frame + self.payload_frames)]:
+            payload = self.get(frame_number)
+            if payload is not None:
+                yield frame_number, payload
+
+def extract_message_from_video(video_path: str, password: str, seek: bool = True,
+                               progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> str:
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video file not found: {video_path}")
     
-    vidcap.release()
-    out.release()
-    cv2.destroyAllWindows()
+    vidcap = cv2.VideoCapture(video_path)
+    
+    if not vidcap.isOpened():
+        raise ValueError(f"Could not open video file: {video_path}. Make sure it's a valid video file.")
     
+    tracker = Progress(progress, cancel, unit='frames')
     try:
-        _combine_video_audio(video_path, output_path)
+        with profiling.span('video.decode'):
+            ret, frame = vidcap.read()
+        if not ret:
+            return "No hidden message found"
+        profiling.count('frames')
+        
+        layout = _parse_video_metadata(_lsb_read_bits(frame, VIDEO_SCATTER_METADATA_BITS))
+        if layout is None:
+            # Files written before packed frames: one character per frame with text delimiters.
+            vidcap, encrypted_message, failure = _extract_legacy_words(vidcap, video_path, frame, seek)
+            if failure:
+                return failure
+            if not encrypted_message:
+                return "No hidden message found"
+            flags = 0
+        else:
+            start_frame, bits_per_frame, scatter_frames = layout
+            vidcap = _position_at_frame(vidcap, video_path, start_frame, seek)
+            if scatter_frames:
+                permutation = ScatterPermutation(scatter_key(password), scatter_frames * bits_per_frame)
+                read_bits = ScatterBitReader(_FrameGather(vidcap, video_path, start_frame, bits_per_frame, seek, tracker), permutation)
+                # One pass for the payload header and one for the payload.
+                tracker.total = 2 * scatter_frames
+            else:
+                read_bits = track_bits(StreamBitReader(_iter_frame_bits(vidcap, bits_per_frame)), tracker, bits_per_frame)
+            try:
+                with profiling.span('video.extract'):
+                    found = read_container_with_flags(read_bits, METHOD_VIDEO_LSB, legacy_fallback=False)
+                tracker.finish()
+            except ValueError as e:
+                return f"Failed to extract message: {str(e)}"
+            if found is None:
+                return "No hidden message found"
+            encrypted_message, flags = found
     except Exception as e:
-        if os.path.exists('stego_TEMP.avi'):
-            os.remove('stego_TEMP.avi')
-        if os.path.exists('audio_TEMP.mp3'):
-            os.remove('audio_TEMP.mp3')
-        raise RuntimeError(f"Error combining video and audio: {str(e)}")
+        raise RuntimeError(f"Error extracting message from video: {str(e)}")
+    finally:
+        vidcap.release()
+        cv2.destroyAllWindows()
     
-    print(f"Message successfully hidden in {output_path}")
-    return message
+    return decrypt_payload(encrypted_message, password, flags_compression(flags))
 
-def extract_message_from_video(video_path: str, password: str) -> str:
+def extract_file_from_video(video_path: str, password: str, output_path: str, seek: bool = True,
+                            progress: Optional[ProgressCallback] = None, cancel: Optional[CancelToken] = None) -> str:
     if not os.path.exists(video_path):
         raise FileNotFoundError(f"Video file not found: {video_path}")
     
@@ -128,192 +292,534 @@ def extract_message_from_video(video_path: str, password: str) -> str:
     if not vidcap.isOpened():
         raise ValueError(f"Could not open video file: {video_path}. Make sure it's a valid video file.")
     
-    first_delimiter = "^$^"
-    word_delimiter = "^*^"
-    frame_delimiter = "^#^"
-    
-    frame_number = 0
-    start_frame = None
-    extracted_words = []
-    
+    tracker = Progress(progress, cancel, unit='frames')
     try:
-        while vidcap.isOpened():
-            frame_number += 1
+        with profiling.span('video.decode'):
             ret, frame = vidcap.read()
-            
-            if not ret:
-                break
-            
-            if frame_number == 1:
-                metadata = _lsb_extract_frame(frame)
-                
-                if metadata and first_delimiter in metadata:
-                    metadata_parts = metadata.split(first_delimiter)
-                    if len(metadata_parts) > 1:
-                        metadata = metadata_parts[1]
-                        
-                        if word_delimiter in metadata:
-                            start_frame_str = metadata.split(word_delimiter)[0]
-                            try:
-                                start_frame = int(start_frame_str)
-                            except ValueError:
-                                print("Invalid metadata format")
-                                return "No valid hidden message found"
-                        else:
-                            print("No word delimiter found in metadata")
-                            return "Invalid metadata format"
-                    else:
-                        print("Invalid first delimiter format")
-                        return "Invalid metadata format"
-                else:
-                    print("No steganography metadata found in video")
-                    return "No hidden message found"
-            
-            elif start_frame and frame_number >= start_frame:
-                word = _lsb_extract_frame(frame)
-                
-                if not word:
-                    continue
-                
-                if frame_delimiter in word:
-                    word = word.split(frame_delimiter)[0]
-                    extracted_words.append(word)
-                    break
-                
-                elif word_delimiter in word:
-                    word = word.split(word_delimiter)[0]
-                    extracted_words.append(word)
-                else:
-                    extracted_words.append(word)
+        if not ret:
+            return "No hidden message found"
+        profiling.count('frames')
+        
+        layout = _parse_video_metadata(_lsb_read_bits(frame, VIDEO_SCATTER_METADATA_BITS))
+        if layout is None:
+            return "No hidden message found"
+        
+        # File payloads are never scattered.
+        start_frame, bits_per_frame, _ = layout
+        vidcap = _position_at_frame(vidcap, video_path, start_frame, seek)
+        read_bits = track_bits(StreamBitReader(_iter_frame_bits(vidcap, bits_per_frame)), tracker, bits_per_frame)
+        try:
+            chunks = read_container_stream(read_bits, METHOD_VIDEO_LSB)
+            if chunks is None:
+                return "No hidden message found"
+            result = decrypt_stream_to_file(chunks, password, output_path)
+            tracker.finish()
+            return result
+        except ValueError as e:
+            return f"Failed to extract message: {str(e)}"
     except Exception as e:
-        vidcap.release()
-        cv2.destroyAllWindows()
         raise RuntimeError(f"Error extracting message from video: {str(e)}")
     finally:
         vidcap.release()
         cv2.destroyAllWindows()
+
+def _extract_legacy_words(vidcap, video_path, frame, seek):
+    first_delimiter = "^$^"
+    word_delimiter = "^*^"
+    frame_delimiter = "^#^"
     
-    if not extracted_words:
-        return "No hidden message found"
+    extracted_words = []
     
-    encrypted_message = ''.join(extracted_words)
+    metadata = _lsb_extract_frame(frame)
     
-    try:
-        decrypted_message = decrypt(encrypted_message, password)
-        return decrypted_message
-    except Exception as e:
-        print(f"Error decrypting message: {str(e)}")
-        return f"Failed to decrypt message (possibly incorrect password): {str(e)}"
-
-def _lsb_hide_frame(frame, data):
-    binary_data = ''.join(format(ord(char), '07b') for char in data)
-    length_data = len(binary_data)
+    if metadata and first_delimiter in metadata:
+        metadata_parts = metadata.split(first_delimiter)
+        if len(metadata_parts) > 1:
+            metadata = metadata_parts[1]
+            
+            if word_delimiter in metadata:
+                start_frame_str = metadata.split(word_delimiter)[0]
+                try:
+                    start_frame = int(start_frame_str)
+                except ValueError:
+                    print("Invalid metadata format")
+                    return vidcap, None, "No valid hidden message found"
+            else:
+                print("No word delimiter found in metadata")
+                return vidcap, None, "Invalid metadata format"
+        else:
+            print("Invalid first delimiter format")
+            return vidcap, None, "Invalid metadata format"
+    else:
+        print("No steganography metadata found in video")
+        return vidcap, None, "No hidden message found"
     
-    padding_needed = (3 - (length_data % 3)) % 3
-    binary_data += '0' * padding_needed
-    length_data = len(binary_data)
+    if start_frame < 2:
+        return vidcap, None, "No valid hidden message found"
     
-    index_data = 0
-    pixel_count = 0
+    vidcap = _position_at_frame(vidcap, video_path, start_frame, seek)
     
-    modified_frame = frame.copy()
+    while vidcap.isOpened():
+        ret, frame = vidcap.read()
+        
+        if not ret:
+            break
+        
+        word = _lsb_extract_frame(frame)
+        
+        if not word:
+            continue
+        
+        if frame_delimiter in word:
+            word = word.split(frame_delimiter)[0]
+            extracted_words.append(word)
+            break
+        
+        elif word_delimiter in word:
+            word = word.split(word_delimiter)[0]
+            extracted_words.append(word)
+        else:
+            extracted_words.append(word)
     
-    for i in range(frame.shape[0]):
-        for j in range(frame.shape[1]):
-            pixel_count += 1
-            
-            if pixel_count % 4 == 0:
-                continue
-            
-            pixel = modified_frame[i, j]
-            
-            if index_data + 3 <= length_data:
-                modified_frame[i, j, 0] = (pixel[0] & 0xFE) | int(binary_data[index_data])
-                modified_frame[i, j, 1] = (pixel[1] & 0xFE) | int(binary_data[index_data + 1])
-                modified_frame[i, j, 2] = (pixel[2] & 0xFE) | int(binary_data[index_data + 2])
-                index_data += 3
-            else:
-                if index_data < length_data:
-                    modified_frame[i, j, 0] = (pixel[0] & 0xFE) | int(binary_data[index_data])
-                    index_data += 1
-                
-                if index_data < length_data:
-                    modified_frame[i, j, 1] = (pixel[1] & 0xFE) | int(binary_data[index_data])
-                    index_data += 1
-                
-                if index_data < length_data:
-                    modified_frame[i, j, 2] = (pixel[2] & 0xFE) | int(binary_data[index_data])
-                    index_data += 1
-            
-            if index_data >= length_data:
-                return modified_frame
+    return vidcap, ''.join(extracted_words), None
+
+def _video_metadata_bits(start_frame, bits_per_frame, scatter_frames=0):
+    if scatter_frames:
+        return bytes_to_bits(struct.pack(VIDEO_SCATTER_FORMAT, VIDEO_SCATTER_MAGIC, start_frame, bits_per_frame, scatter_frames))
+    return bytes_to_bits(struct.pack(VIDEO_METADATA_FORMAT, VIDEO_METADATA_MAGIC, start_frame, bits_per_frame))
+
+def _parse_video_metadata(bits):
+    # Returns (start_frame, bits_per_frame, scatter_frames); scatter_frames is 0 for packed payloads.
+    if len(bits) < VIDEO_METADATA_BITS:
+        return None
+    data = bits_to_bytes(bits)
+    if data[:4] == VIDEO_SCATTER_MAGIC and len(bits) >= VIDEO_SCATTER_METADATA_BITS:
+        magic, start_frame, bits_per_frame, scatter_frames = struct.unpack(VIDEO_SCATTER_FORMAT, data[:VIDEO_SCATTER_METADATA_BITS // 8])
+    else:
+        magic, start_frame, bits_per_frame = struct.unpack(VIDEO_METADATA_FORMAT, data[:VIDEO_METADATA_BITS // 8])
+        scatter_frames = 0
+    if magic not in (VIDEO_METADATA_MAGIC, VIDEO_SCATTER_MAGIC) or start_frame < 2 or bits_per_frame == 0:
+        return None
+    return start_frame, bits_per_frame, scatter_frames
+
+def _iter_frame_bits(vidcap, bits_per_frame):
+    while True:
+        with profiling.span('video.decode'):
+            ret, frame = vidcap.read()
+        if not ret:
+            return
+        profiling.count('frames')
+        yield _lsb_read_bits(frame, bits_per_frame)
+
+class _FrameGather:
+    # gather() for ScatterBitReader over frames from start_frame, with `vidcap` positioned there. A capture
+    # only moves forward, so every read after the first reopens the video for a new pass; each pass stops
+    # at the frame holding the last requested slot.
+    def __init__(self, vidcap, video_path, start_frame, bits_per_frame, seek, tracker):
+        self.vidcap = vidcap
+        self.video_path = video_path
+        self.start_frame = start_frame
+        self.bits_per_frame = bits_per_frame
+        self.seek = seek
+        self.tracker = tracker
+        self._passes = 0
+    
+    def __call__(self, positions):
+        if self._passes:
+            self._rewind()
+        self._passes += 1
+        
+        values = []
+        first_slot = 0
+        while len(positions) and first_slot <= positions[-1]:
+            with profiling.span('video.decode'):
+                ret, frame = self.vidcap.read()
+            if not ret:
+                break
+            profiling.count('frames')
+            chosen = band_slice(positions, first_slot, first_slot + self.bits_per_frame)
+            if chosen.start != chosen.stop:
+                values.append(_lsb_read_slots(frame, positions[chosen] - first_slot))
+            first_slot += self.bits_per_frame
+            self.tracker.advance()
+        return np.concatenate(values) if values else np.zeros(0, dtype=np.uint8)
+    
+    def _rewind(self):
+        # Reopens the same capture object, so the caller's reference (and its release()) stays valid.
+        self.vidcap.open(self.video_path)
+        if self.seek and _seek_to_frame(self.vidcap, self.start_frame):
+            return
+        self.vidcap.open(self.video_path)
+        for _ in range(self.start_frame - 1):
+            if not self.vidcap.grab():
+                break
+
+def _position_at_frame(vidcap, video_path, frame_number, seek):
+    # Leaves the capture (possibly a fresh one) so the next read() returns 1-based `frame_number`,
+    # assuming frame 1 has already been read.
+    if seek and _seek_to_frame(vidcap, frame_number):
+        return vidcap
+    
+    frames_to_skip = frame_number - 2
+    if seek:
+        # A failed seek may have moved the capture anywhere; start over from the first frame.
+        vidcap.release()
+        vidcap = cv2.VideoCapture(video_path)
+        frames_to_skip = frame_number - 1
+    
+    # Frames before frame_number carry nothing: grab() skips them without the
+    # colour conversion that read() would do.
+    for _ in range(frames_to_skip):
+        if not vidcap.grab():
+            break
+    return vidcap
+
+def _verified_frame_count(video_path):
+    # CAP_PROP_FRAME_COUNT can be approximate, and seeking near the end is no proof either: OpenCV's
+    # seek emulation can land on a frame that sequential reads never reach. Grabbing every frame
+    # (without colour conversion) counts exactly the frames the encode pass will see.
+    vidcap = cv2.VideoCapture(video_path)
+    try:
+        frames = 0
+        while vidcap.grab():
+            frames += 1
+        return frames
+    finally:
+        vidcap.release()
+
+def _seek_to_frame(vidcap, frame_number):
+    # Positions the capture so the next read() returns 1-based `frame_number`. Returns False when
+    # the backend cannot seek or does not land exactly on the frame, so callers fall back to decoding sequentially.
+    target = frame_number - 1
+    if not vidcap.set(cv2.CAP_PROP_POS_FRAMES, target):
+        return False
+    return int(vidcap.get(cv2.CAP_PROP_POS_FRAMES)) == target
+
+def _lsb_embed_bits(frame, bits):
+    # Writes bits into the R, G, B LSBs of the usable pixels in order, zero-padding the last pixel.
+    # Returns how many bits fit.
+    padding_needed = (3 - (len(bits) % 3)) % 3
+    bits = np.concatenate((bits, np.zeros(padding_needed, dtype=np.uint8)))
+    
+    channels = frame.reshape(-1, 3)
+    usable = _usable_pixels(channels.shape[0])
+    
+    pixel_count = min(len(bits) // 3, len(usable))
+    targets = usable[:pixel_count]
+    channels[targets] = (channels[targets] & 0xFE) | bits[:pixel_count * 3].reshape(-1, 3)
+    return pixel_count * 3
+
+def _lsb_embed_slots(frame, slots, bits):
+    # Writes bits at positions in the LSB sequence _lsb_embed_bits fills (R, G, B of each usable pixel).
+    channels = frame.reshape(-1, 3)
+    pixels = _usable_pixels(channels.shape[0])[slots // 3]
+    channels[pixels, slots % 3] = (channels[pixels, slots % 3] & 0xFE) | bits
+
+def _lsb_read_slots(frame, slots):
+    channels = frame.reshape(-1, 3)
+    return channels[_usable_pixels(channels.shape[0])[slots // 3], slots % 3] & 1
+
+def _lsb_read_bits(frame, count):
+    channels = frame.reshape(-1, 3)
+    usable = _usable_pixels(channels.shape[0])
     
-    print(f"Warning: Frame too small to hide all data. Only {index_data}/{length_data} bits were hidden.")
-    return modified_frame
+    pixel_count = min(-(-count // 3), len(usable))
+    return (channels[usable[:pixel_count]] & 1).reshape(-1)[:count]
 
 def _lsb_extract_frame(frame):
     MAX_CHARS = 150
-    binary_data = ""
-    extracted_chars = []
-    pixel_count = 0
-    
-    for i in range(frame.shape[0]):
-        for j in range(frame.shape[1]):
-            pixel = frame[i, j]
-            pixel_count += 1
-            
-            if pixel_count % 4 == 0:
-                continue
-            
-            binary_data += str(pixel[0] & 1)
-            binary_data += str(pixel[1] & 1)
-            binary_data += str(pixel[2] & 1)
-            
-            while len(binary_data) >= 7:
-                char_code = int(binary_data[:7], 2)
-                char = chr(char_code)
-                extracted_chars.append(char)
-                binary_data = binary_data[7:]
-                
-                current_text = ''.join(extracted_chars[-10:])
-                
-                if "^*^" in current_text or "^#^" in current_text:
-                    return ''.join(extracted_chars)
-            
-            if len(extracted_chars) > MAX_CHARS:
-                full_text = ''.join(extracted_chars)
-                if "^*^" in full_text or "^#^" in full_text:
-                    return full_text
-                
-                return full_text
     
-    if extracted_chars:
-        return ''.join(extracted_chars)
+    # At most MAX_CHARS + 1 characters are ever returned, so only their pixels are read.
+    bits = _lsb_read_bits(frame, (MAX_CHARS + 1) * 7)
     
-    return None
+    char_count = len(bits) // 7
+    if char_count == 0:
+        return None
+    
+    septets = bits[:char_count * 7].reshape(-1, 7)
+    text = np.packbits(np.pad(septets, ((0, 0), (1, 0))), axis=1).tobytes()
+    
+    ends = [pos + len(delimiter) for delimiter in (b"^*^", b"^#^") for pos in [text.find(delimiter)] if pos >= 0]
+    if ends:
+        text = text[:min(ends)]
+    
+    return text.decode('ascii')
 
-def _combine_video_audio(video_path, output_path):
-    print("Combining video with original audio...")
+def _frame_capacity(num_pixels):
+    return len(_usable_pixels(num_pixels)) * 3
+
+@lru_cache(maxsize=8)
+def _usable_pixels(num_pixels):
+    # Every pixel except each 4th one (index % 4 == 3) carries three LSBs.
+    indices = np.flatnonzero(np.arange(num_pixels) % 4 != 3)
+    indices.flags.writeable = False
+    return indices
+
+MIN_SEGMENT_FRAMES = 250
+
+def _plan_segments(video_path, total_frames, workers):
+    # Splits the clip into (first_frame, frame_count) ranges, one per worker; the last range
+    # runs to the end of the stream since CAP_PROP_FRAME_COUNT can be approximate.
+    # Falls back to a single range when the clip is short or the container cannot seek exactly.
+    count = min(workers, total_frames // MIN_SEGMENT_FRAMES)
+    if count < 2:
+        return [(1, None)]
     
-    original_clip = VideoFileClip(video_path)
-    original_clip.audio.write_audiofile("audio_TEMP.mp3", logger=None)
+    starts = [1 + index * total_frames // count for index in range(count)]
     
-    audio_clip = AudioFileClip("audio_TEMP.mp3")
+    vidcap = cv2.VideoCapture(video_path)
+    try:
+        if not _seek_to_frame(vidcap, starts[1]):
+            return [(1, None)]
+    finally:
+        vidcap.release()
     
-    video_clip = VideoFileClip("stego_TEMP.avi")
+    return [(first, next_first - first) for first, next_first in zip(starts, starts[1:])] + [(starts[-1], None)]
+
+def _encode_segment(video_path, segment_path, first_frame, frame_count, fps, frame_size, frame_bits, stats=None,
+                    tracker=None):
+    # Decodes frames [first_frame, first_frame + frame_count), embeds the bits in `frame_bits`
+    # (keyed by 1-based frame number) and encodes them to an FFV1 file. Runs in worker processes too.
+    # `tracker` is advanced once per frame, which is also where cancellation is checked.
+    if stats is None:
+        stats = PipelineStats()
     
-    final_clip = video_clip.with_audio(audio_clip)
+    vidcap = cv2.VideoCapture(video_path)
+    try:
+        if first_frame > 1 and not _seek_to_frame(vidcap, first_frame):
+            raise RuntimeError(f"Could not seek to frame {first_frame}")
+        
+        out = cv2.VideoWriter(segment_path, cv2.VideoWriter_fourcc(*'FFV1'), fps=fps, frameSize=frame_size)
+        if not out.isOpened():
+            raise RuntimeError(
+                "Failed to create output video file. "
+                "Check if the codec is supported and you have write permissions."
+            )
+        
+        def embed(frame_index, frame):
+            # Frames outside the payload range pass through untouched.
+            payload = frame_bits.get(first_frame + frame_index - 1)
+            if isinstance(payload, tuple):
+                _lsb_embed_slots(frame, *payload)
+            elif payload is not None:
+                _lsb_embed_bits(frame, payload)
+            if tracker is not None:
+                tracker.advance()
+        
+        try:
+            frame_width, frame_height = frame_size
+            frames = _run_pipeline(vidcap, out, embed, (frame_height, frame_width, 3), stats, frame_count)
+        finally:
+            out.release()
+    finally:
+        vidcap.release()
     
-    final_clip.write_videofile(output_path, codec="ffv1", audio_codec="aac", logger=None)
+    return frames, stats
+
+def _encode_segments_parallel(video_path, work_dir, segments, fps, frame_size, frame_bits, workers, stats, tracker):
+    segment_paths = []
+    frames_processed = 0
+    
+    # Workers count their frames into a shared counter and stop at the next frame once `stop` is set.
+    stop = multiprocessing.Event()
+    frames_done = multiprocessing.Value('q', 0)
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_segment_worker, initargs=(stop, frames_done)) as pool:
+        futures = []
+        for index, (first_frame, frame_count) in enumerate(segments):
+            segment_path = os.path.join(work_dir, f'segment_{index:04d}.avi')
+            segment_bits = {number: payload for number, payload in frame_bits.items()
+                            if number >= first_frame and (frame_count is None or number < first_frame + frame_count)}
+            future = pool.submit(_encode_worker_segment, video_path, segment_path, first_frame, frame_count,
+                                 fps, frame_size, segment_bits)
+            segment_paths.append(segment_path)
+            futures.append((frame_count, future))
+        
+        pending = {future for _, future in futures}
+        try:
+            while pending:
+                _, pending = wait(pending, timeout=PROGRESS_INTERVAL)
+                if tracker.cancel is not None and tracker.cancel.cancelled:
+                    stop.set()
+                tracker.update(frames_done.value)
+        except BaseException:
+            stop.set()
+            pool.shutdown(cancel_futures=True)
+            raise
+        
+        for segment_path, (frame_count, future) in zip(segment_paths, futures):
+            frames, segment_stats = future.result()
+            if frame_count is not None and frames != frame_count:
+                raise RuntimeError(f"Segment {os.path.basename(segment_path)} ended after {frames} of {frame_count} frames")
+            if stats is not None:
+                stats.add(segment_stats)
+            frames_processed += frames
+    
+    return segment_paths, frames_processed
+
+_segment_tracker = None
+
+class _SegmentTracker:
+    # Worker-side stand-in for Progress: frames go to the parent's shared counter.
+    def __init__(self, stop, frames_done):
+        self.cancel = CancelToken(stop)
+        self.frames_done = frames_done
+    
+    def advance(self, units=1):
+        with self.frames_done.get_lock():
+            self.frames_done.value += units
+        self.cancel.raise_if_cancelled()
+
+def _init_segment_worker(stop, frames_done):
+    global _segment_tracker
+    _segment_tracker = _SegmentTracker(stop, frames_done)
+
+def _encode_worker_segment(*args):
+    return _encode_segment(*args, tracker=_segment_tracker)
+
+class StageStats:
+    def __init__(self):
+        self.frames = 0
+        self.seconds = 0.0
+    
+    @property
+    def fps(self) -> float:
+        return self.frames / self.seconds if self.seconds else 0.0
+
+class PipelineStats:
+    # Per-stage throughput of the decode -> embed -> encode pipeline; `seconds` is busy time, not waiting time.
+    def __init__(self):
+        self.decode = StageStats()
+        self.embed = StageStats()
+        self.encode = StageStats()
+    
+    def add(self, other: "PipelineStats") -> None:
+        for name in ('decode', 'embed', 'encode'):
+            stage, other_stage = getattr(self, name), getattr(other, name)
+            stage.frames += other_stage.frames
+            stage.seconds += other_stage.seconds
+    
+    def as_dict(self) -> dict:
+        return {name: {'frames': stage.frames, 'seconds': stage.seconds, 'fps': stage.fps}
+                for name, stage in (('decode', self.decode), ('embed', self.embed), ('encode', self.encode))}
+
+PIPELINE_QUEUE_SIZE = 8
+_END_OF_STREAM = object()
+
+def _run_pipeline(vidcap, out, embed, frame_shape, stats=None, max_frames=None):
+    # Reader thread -> embed (calling thread) -> writer thread, joined by bounded queues.
+    # Frames are decoded into a fixed pool of buffers that the writer hands back once encoded.
+    # OpenCV releases the GIL while decoding and encoding, so the three stages overlap.
+    if stats is None:
+        stats = PipelineStats()
+    
+    free_buffers = queue.Queue()
+    for _ in range(2 * PIPELINE_QUEUE_SIZE + 2):
+        free_buffers.put(np.empty(frame_shape, dtype=np.uint8))
+    decoded = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    to_encode = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    
+    failed = threading.Event()
+    errors = []
+    
+    def reader():
+        try:
+            frame_number = 0
+            while not failed.is_set() and (max_frames is None or frame_number < max_frames):
+                buffer = free_buffers.get()
+                started = time.perf_counter()
+                ret, frame = vidcap.read(buffer)
+                if not ret:
+                    break
+                stats.decode.seconds += time.perf_counter() - started
+                stats.decode.frames += 1
+                frame_number += 1
+                decoded.put((frame_number, frame))
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+        finally:
+            decoded.put(_END_OF_STREAM)
+    
+    def writer():
+        while True:
+            item = to_encode.get()
+            if item is _END_OF_STREAM:
+                return
+            frame = item
+            if not failed.is_set():
+                try:
+                    started = time.perf_counter()
+                    out.write(frame)
+                    stats.encode.seconds += time.perf_counter() - started
+                    stats.encode.frames += 1
+                except Exception as e:
+                    errors.append(e)
+                    failed.set()
+            free_buffers.put(frame)
+    
+    threads = [threading.Thread(target=reader, daemon=True), threading.Thread(target=writer, daemon=True)]
+    for thread in threads:
+        thread.start()
+    
+    try:
+        while True:
+            item = decoded.get()
+            if item is _END_OF_STREAM:
+                break
+            frame_number, frame = item
+            if failed.is_set():
+                free_buffers.put(frame)
+                continue
+            try:
+                started = time.perf_counter()
+                embed(frame_number, frame)
+                stats.embed.seconds += time.perf_counter() - started
+                stats.embed.frames += 1
+            except BaseException as e:
+                # Includes JobCancelled: the reader is stopped and the queues drained before it is re-raised.
+                errors.append(e)
+                failed.set()
+            to_encode.put(frame)
+    finally:
+        to_encode.put(_END_OF_STREAM)
+        for thread in threads:
+            thread.join()
     
-    original_clip.close()
-    audio_clip.close()
-    video_clip.close()
-    final_clip.close()
+    if errors:
+        raise errors[0]
+    return stats.encode.frames
+
+def _combine_video_audio(video_path, stego_video_paths, output_path):
+    print("Combining video with original audio...")
     
-    if os.path.exists("audio_TEMP.mp3"):
-        os.remove("audio_TEMP.mp3")
-    if os.path.exists("stego_TEMP.avi"):
-        os.remove("stego_TEMP.avi")
+    if len(stego_video_paths) == 1:
+        video_input = ['-i', stego_video_paths[0]]
+    else:
+        # FFV1 segments share codec parameters, so the concat demuxer joins them losslessly.
+        list_path = os.path.join(os.path.dirname(stego_video_paths[0]), 'segments.txt')
+        with open(list_path, 'w') as f:
+            for path in stego_video_paths:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        video_input = ['-f', 'concat', '-safe', '0', '-i', list_path]
+    
+    # Copy the already-encoded FFV1 stream and the original audio packets into the output
+    # container; nothing is decoded or re-encoded.
+    command = [
+        imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error',
+        *video_input, '-i', video_path,
+        '-map', '0:v:0', '-map', '1:a?',
+        '-c:v', 'copy', '-c:a', 'copy',
+        output_path,
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    
+    if result.returncode != 0:
+        # Some audio codecs cannot be stored in the output container as-is; transcode only the audio.
+        command[command.index('-c:a') + 1] = 'aac'
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()}")
     
     print(f"Video steganography completed: {output_path}")
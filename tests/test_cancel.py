@@ -0,0 +1,38 @@
+import wave
+
+import numpy as np
+import pytest
+
+from stego.audio_stego import AUDIO_LSB_MODES, hide_message_in_audio_lsb, extract_message_from_audio_lsb
+from utils import progress
+from utils.progress import CancelToken, JobCancelled
+
+
+@pytest.fixture
+def stego_wav(tmp_path):
+    carrier = tmp_path / 'carrier.wav'
+    samples = np.random.default_rng(0).integers(-3000, 3000, 200000, dtype=np.int16)
+    with wave.open(str(carrier), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(samples.tobytes())
+    output = tmp_path / 'stego.wav'
+    hide_message_in_audio_lsb(str(carrier), 'x' * 3000, 'secret', str(output))
+    return str(output)
+
+@pytest.mark.parametrize('scatter', [False, True])
+@pytest.mark.parametrize('mode', AUDIO_LSB_MODES)
+def test_audio_lsb_extract_cancelled_midway(monkeypatch, stego_wav, mode, scatter):
+    if scatter:
+        hide_message_in_audio_lsb(stego_wav, 'x' * 3000, 'secret', stego_wav + '.scatter.wav', scatter=True)
+        stego_wav += '.scatter.wav'
+    monkeypatch.setattr(progress, 'PROGRESS_INTERVAL', 0)
+    token = CancelToken()
+
+    # The first progress event cancels the job, so it stops at the next check.
+    with pytest.raises(JobCancelled):
+        extract_message_from_audio_lsb(stego_wav, 'secret', mode=mode, chunk_frames=1024, scatter=scatter,
+                                       progress=lambda event: token.cancel(), cancel=token)
+
+    assert extract_message_from_audio_lsb(stego_wav, 'secret', mode=mode, chunk_frames=1024, scatter=scatter) == 'x' * 3000
@@ -0,0 +1,12 @@
+from utils.crypto import binary_to_text, text_to_binary
+
+
+def test_text_to_binary_matches_code_points():
+    assert text_to_binary('Ab') == '0100000101100010'
+    assert text_to_binary('é') == '11101001'
+    assert text_to_binary('Ā€') == format(0x100, '08b') + format(0x20AC, '08b')
+
+def test_binary_to_text_round_trips_ascii():
+    token = 'gAAAAABl-fernet_token=='
+    assert binary_to_text(text_to_binary(token)).decode() == token
+    assert binary_to_text('0100000101') == bytearray(b'A@')
@@ -0,0 +1,48 @@
+import wave
+
+import numpy as np
+import pytest
+
+from stego.audio_stego import (AUDIO_LSB_MODES, hide_file_in_audio_lsb, extract_file_from_audio_lsb,
+                               extract_message_from_audio_lsb)
+from utils.payload import HEADER_BITS, METHOD_IMAGE_LSB, read_container_with_flags, stream_container_bits
+
+FILE_PAYLOAD_ERROR = "Failed to extract message: Carrier holds a file payload; extract it with --output-file"
+
+
+@pytest.fixture
+def file_carrier(tmp_path):
+    carrier = tmp_path / 'carrier.wav'
+    with wave.open(str(carrier), 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(np.random.default_rng(0).integers(-3000, 3000, 300000, dtype=np.int16).tobytes())
+    payload = tmp_path / 'payload.bin'
+    payload.write_bytes(np.random.default_rng(1).integers(0, 256, 20000, dtype=np.uint8).tobytes())
+    output = tmp_path / 'stego.wav'
+    hide_file_in_audio_lsb(str(carrier), str(payload), 'secret', str(output), chunk_size=4096)
+    return str(output), payload.read_bytes()
+
+@pytest.mark.parametrize('mode', AUDIO_LSB_MODES)
+def test_message_extract_rejects_file_payload(file_carrier, mode):
+    stego_wav, _ = file_carrier
+    assert extract_message_from_audio_lsb(stego_wav, 'secret', mode=mode) == FILE_PAYLOAD_ERROR
+
+def test_file_extract_still_reads_file_payload(tmp_path, file_carrier):
+    stego_wav, payload = file_carrier
+    extract_file_from_audio_lsb(stego_wav, 'secret', str(tmp_path / 'extracted.bin'))
+    assert (tmp_path / 'extracted.bin').read_bytes() == payload
+
+def test_file_payload_rejected_after_header_only():
+    chunks = [b'\x00' * 1024] * 64
+    bits = np.concatenate(list(stream_container_bits(chunks, 64 * 1024, METHOD_IMAGE_LSB)))
+    reads = []
+
+    def read_bits(start, count):
+        reads.append((start, count))
+        return bits[start:start + count]
+
+    with pytest.raises(ValueError, match="file payload"):
+        read_container_with_flags(read_bits, METHOD_IMAGE_LSB)
+    assert reads == [(0, HEADER_BITS)]
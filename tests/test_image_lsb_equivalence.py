@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageCms, PngImagePlugin
+
+from stego.image_stego import hide_message_in_image_lsb, extract_message_from_image_lsb
+from utils import crypto
+from utils.compression import compress_payload, COMPRESSION_ZLIB
+from utils.crypto import encrypt, encrypt_bytes, text_to_binary
+from utils.payload import container_bits, compression_flags, METHOD_IMAGE_LSB
+
+MESSAGE = 'The quick brown fox jumps over the lazy dog. ' * 20
+PASSWORD = 'secret'
+
+
+def _baseline_hide(image_path, binary_message, output_path):
+    # The per-pixel loop and save the LSB method shipped with before it was vectorised.
+    img = Image.open(image_path)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    width, height = img.size
+    pixels = img.load()
+
+    idx = 0
+    for y in range(height):
+        for x in range(width):
+            if idx < len(binary_message):
+                r, g, b = pixels[x, y]
+                if idx < len(binary_message):
+                    r = r & ~1 | int(binary_message[idx])
+                    idx += 1
+                if idx < len(binary_message):
+                    g = g & ~1 | int(binary_message[idx])
+                    idx += 1
+                if idx < len(binary_message):
+                    b = b & ~1 | int(binary_message[idx])
+                    idx += 1
+                pixels[x, y] = (r, g, b)
+
+    img.save(output_path, 'PNG')
+
+def _container_binary(message, password):
+    compressed_message, codec_id = compress_payload(message.encode(), COMPRESSION_ZLIB)
+    bits = container_bits(encrypt_bytes(compressed_message, password), METHOD_IMAGE_LSB, compression_flags(codec_id))
+    return ''.join(map(str, bits))
+
+@pytest.fixture
+def pinned_random(monkeypatch):
+    # Fixed salt and nonce, so both engines embed the same ciphertext.
+    monkeypatch.setattr(crypto.os, 'urandom', lambda size: bytes(range(size)))
+
+@pytest.fixture(params=['rgb.png', 'tagged.png', 'rgba.png', 'tagged.jpg'])
+def carrier(request, tmp_path):
+    pixels = np.random.default_rng(0).integers(0, 256, (97, 61, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels)
+    path = tmp_path / request.param
+    if request.param == 'rgb.png':
+        image.save(path)
+    elif request.param == 'rgba.png':
+        image.convert('RGBA').save(path)
+    else:
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Title', 'carrier')
+        info.add_itxt('Description', 'wörld')
+        icc_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+        image.save(path, icc_profile=icc_profile, dpi=(300, 300), pnginfo=info)
+    return str(path)
+
+def test_hide_matches_baseline_loop(tmp_path, pinned_random, carrier):
+    _baseline_hide(carrier, _container_binary(MESSAGE, PASSWORD), str(tmp_path / 'baseline.png'))
+    hide_message_in_image_lsb(carrier, MESSAGE, PASSWORD, str(tmp_path / 'engine.png'))
+
+    baseline, engine = Image.open(tmp_path / 'baseline.png'), Image.open(tmp_path / 'engine.png')
+    assert engine.mode == baseline.mode == 'RGB'
+    assert engine.tobytes() == baseline.tobytes()
+
+    source = Image.open(carrier)
+    assert engine.info.get('icc_profile') == baseline.info.get('icc_profile')
+    assert engine.info.get('dpi') == pytest.approx(source.info.get('dpi'), abs=0.01)
+    for key in getattr(source, 'text', {}):
+        assert engine.info[key] == source.info[key]
+
+def test_extract_reads_baseline_output(tmp_path, pinned_random, carrier):
+    _baseline_hide(carrier, _container_binary(MESSAGE, PASSWORD), str(tmp_path / 'baseline.png'))
+    assert extract_message_from_image_lsb(str(tmp_path / 'baseline.png'), PASSWORD) == MESSAGE
+
+def test_extract_reads_legacy_delimited_output(tmp_path, carrier):
+    # Files written before the length-prefixed header: Fernet text followed by a 16-bit delimiter.
+    _baseline_hide(carrier, text_to_binary(encrypt(MESSAGE, PASSWORD)) + '1111111111111110', str(tmp_path / 'legacy.png'))
+    assert extract_message_from_image_lsb(str(tmp_path / 'legacy.png'), PASSWORD) == MESSAGE
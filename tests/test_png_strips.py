@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageCms, PngImagePlugin
+
+from utils.png_strips import PngStripReader, PngStripWriter, open_png_strips
+
+
+def _copy_png(source_path, output_path, band_rows=7):
+    with open_png_strips(source_path) as source:
+        with PngStripWriter(output_path, source.width, source.height, metadata=source.metadata) as sink:
+            while source.rows_read < source.height:
+                sink.write_rows(source.read_rows(min(band_rows, source.height - source.rows_read)))
+
+def _tagged_info():
+    info = PngImagePlugin.PngInfo()
+    info.add_text('Title', 'carrier')
+    info.add_text('Comment', 'compressed', zip=True)
+    info.add_itxt('Description', 'wörld')
+    info.add(b'gAMA', (45455).to_bytes(4, 'big'))
+    return info
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L', 'P'])
+def test_strip_copy_keeps_pixels_and_metadata(tmp_path, mode):
+    pixels = np.random.default_rng(0).integers(0, 256, (45, 31, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels).convert(mode)
+    icc_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    image.save(tmp_path / 'source.png', icc_profile=icc_profile, dpi=(300, 300), pnginfo=_tagged_info())
+
+    _copy_png(str(tmp_path / 'source.png'), str(tmp_path / 'copy.png'))
+
+    source, copy = Image.open(tmp_path / 'source.png'), Image.open(tmp_path / 'copy.png')
+    assert copy.mode == 'RGB'
+    assert np.array_equal(np.array(copy), np.array(source.convert('RGB')))
+    for key in ('icc_profile', 'dpi', 'gamma', 'Title', 'Comment', 'Description'):
+        assert copy.info[key] == source.info[key]
+
+def test_metadata_is_written_before_image_data(tmp_path):
+    Image.new('RGB', (8, 8)).save(tmp_path / 'source.png', dpi=(72, 72), pnginfo=_tagged_info())
+    _copy_png(str(tmp_path / 'source.png'), str(tmp_path / 'copy.png'))
+
+    # The reader only collects chunks that precede the first IDAT.
+    with PngStripReader(str(tmp_path / 'source.png')) as source, PngStripReader(str(tmp_path / 'copy.png')) as copy:
+        assert copy.metadata == source.metadata
+        assert {chunk_type for chunk_type, _ in copy.metadata} == {b'gAMA', b'pHYs', b'tEXt', b'zTXt', b'iTXt'}
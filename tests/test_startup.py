@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Each scenario runs in a fresh interpreter, so modules imported by other tests do not count.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENGINES = {'image': 'stego.image_stego', 'audio': 'stego.audio_stego', 'video': 'stego.video_stego'}
+
+
+def _imported_modules(code):
+    code += "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    modules = set(json.loads(result.stdout.splitlines()[-1]))
+    return modules | {name.split('.')[0] for name in modules}
+
+def test_importing_cli_loads_no_backend():
+    modules = _imported_modules("import main")
+    for backend in ('cv2', 'scipy', 'cryptography', 'PIL', 'numpy'):
+        assert backend not in modules
+    assert not modules & set(ENGINES.values())
+
+def test_cli_help_loads_no_backend():
+    modules = _imported_modules("import sys, main\nsys.argv = ['main.py', '--help']\n"
+                                "try:\n    main.main()\nexcept SystemExit:\n    pass")
+    for backend in ('cv2', 'scipy', 'cryptography', 'PIL', 'numpy'):
+        assert backend not in modules
+
+def test_method_lookup_loads_no_engine():
+    modules = _imported_modules("from stego.registry import get_method\n"
+                                "for file_type, method in [('image', 'lsb'), ('audio', 'echo'), ('video', 'lsb')]:\n"
+                                "    get_method(file_type, method)")
+    assert not modules & set(ENGINES.values())
+    assert 'numpy' not in modules
+
+# (file type, method, backends the engine must not import)
+@pytest.mark.parametrize('file_type, method, unused', [
+    ('image', 'lsb', ('cv2', 'scipy')),
+    ('image', 'dct', ('cv2', 'scipy', 'imageio_ffmpeg')),
+    ('audio', 'lsb', ('cv2', 'scipy', 'PIL')),
+    ('audio', 'echo', ('cv2', 'PIL')),
+    ('video', 'lsb', ('scipy', 'PIL')),
+])
+def test_loading_a_method_imports_only_its_engine(file_type, method, unused):
+    modules = _imported_modules(f"from stego.registry import get_method\nget_method({file_type!r}, {method!r}).load('hide')")
+    assert ENGINES[file_type] in modules
+    assert not modules & (set(ENGINES.values()) - {ENGINES[file_type]})
+    for backend in unused:
+        assert backend not in modules
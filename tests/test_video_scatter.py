@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+
+from stego import video_stego
+from stego.video_stego import hide_message_in_video, extract_message_from_video
+
+FRAMES = 40
+EXTRA_REPORTED_FRAMES = 3
+
+_VideoCapture = cv2.VideoCapture
+
+
+class _OvercountingCapture:
+    # Reports more frames than the stream holds, as some containers do. Wraps rather than subclasses
+    # cv2.VideoCapture, whose Python subclasses crash the interpreter.
+    def __init__(self, *args):
+        self._capture = _VideoCapture(*args)
+
+    def get(self, prop_id):
+        value = self._capture.get(prop_id)
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT:
+            return value + EXTRA_REPORTED_FRAMES
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self._capture, name)
+
+def _write_clip(path):
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'FFV1'), 10, (64, 48))
+    for _ in range(FRAMES):
+        writer.write(rng.integers(0, 256, (48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+def test_scatter_hide_with_overreported_frame_count(monkeypatch, tmp_path):
+    _write_clip(tmp_path / 'carrier.avi')
+    monkeypatch.setattr(video_stego.cv2, 'VideoCapture', _OvercountingCapture)
+    assert int(cv2.VideoCapture(str(tmp_path / 'carrier.avi')).get(cv2.CAP_PROP_FRAME_COUNT)) == FRAMES + EXTRA_REPORTED_FRAMES
+
+    # Large enough that, scattered over the reported frames, bits would land in the missing ones.
+    message = np.random.default_rng(1).integers(0, 256, 8000, dtype=np.uint8).tobytes().hex()
+    output = str(tmp_path / 'stego.avi')
+    hide_message_in_video(str(tmp_path / 'carrier.avi'), message, 'secret', output, start_frame=2, scatter=True)
+
+    assert extract_message_from_video(output, 'secret') == message
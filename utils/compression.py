@@ -0,0 +1,59 @@
+import lzma
+import zlib
+from typing import Callable, Dict, NamedTuple, Tuple
+from utils import profiling
+
+COMPRESSION_NONE = 'none'
+COMPRESSION_ZLIB = 'zlib'
+COMPRESSION_LZMA = 'lzma'
+
+# Codec ids are stored in four bits of the payload header flags; 0 means uncompressed.
+MAX_CODEC_ID = 15
+
+
+class Codec(NamedTuple):
+    codec_id: int
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+_codecs: Dict[str, Codec] = {}
+
+def register_codec(name: str, codec_id: int, compress: Callable[[bytes], bytes],
+                   decompress: Callable[[bytes], bytes]) -> None:
+    if not 0 < codec_id <= MAX_CODEC_ID:
+        raise ValueError(f"Codec id must be between 1 and {MAX_CODEC_ID}")
+    if name == COMPRESSION_NONE:
+        raise ValueError(f"'{COMPRESSION_NONE}' is reserved")
+    for other_name, codec in _codecs.items():
+        if codec.codec_id == codec_id and other_name != name:
+            raise ValueError(f"Codec id {codec_id} is already used by '{other_name}'")
+    _codecs[name] = Codec(codec_id, compress, decompress)
+
+def available_codecs() -> Tuple[str, ...]:
+    return (COMPRESSION_NONE, *_codecs)
+
+def compress_payload(data: bytes, codec: str = COMPRESSION_ZLIB) -> Tuple[bytes, int]:
+    # Returns (data, codec id). Data that does not shrink is passed through uncompressed with id 0.
+    if codec == COMPRESSION_NONE:
+        return data, 0
+    entry = _codecs.get(codec)
+    if entry is None:
+        raise ValueError(f"Unsupported compression '{codec}'. Choose one of: {', '.join(available_codecs())}")
+
+    with profiling.span('compress'):
+        compressed = entry.compress(data)
+    if len(compressed) >= len(data):
+        return data, 0
+    return compressed, entry.codec_id
+
+def decompress_payload(data: bytes, codec_id: int) -> bytes:
+    if codec_id == 0:
+        return data
+    for codec in _codecs.values():
+        if codec.codec_id == codec_id:
+            with profiling.span('decompress'):
+                return codec.decompress(data)
+    raise ValueError(f"Payload uses an unknown compression codec (id {codec_id})")
+
+register_codec(COMPRESSION_ZLIB, 1, lambda data: zlib.compress(data, 9), zlib.decompress)
+register_codec(COMPRESSION_LZMA, 2, lzma.compress, lzma.decompress)
@@ -1,28 +1,126 @@
 import base64
+import hashlib
 import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator, Optional
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
+from utils.compression import decompress_payload
+from utils.payload import bits_to_bytes, str_to_bits
+from utils import profiling
 
 
+# '0'/'1' string helpers kept for compatibility; new code should use the bit arrays in utils.payload.
+
 def text_to_binary(text: str) -> str:
-    binary = ''.join(format(ord(char), '08b') for char in text)
-    return binary
+    # Code points above 0xFF take more than eight bits, as they always have.
+    return ''.join(format(ord(char), '08b') for char in text)
 
 def binary_to_text(binary: str) -> str:
-    if len(binary) % 8 != 0:
-        padding = 8 - (len(binary) % 8)
-        binary += '0' * padding
-        
-    bytes_data = bytearray()
-    for i in range(0, len(binary), 8):
-        byte = int(binary[i:i+8], 2)
-        bytes_data.append(byte)
+    return bytearray(bits_to_bytes(str_to_bits(binary)))
+
+SALT_SIZE = 16
+GCM_NONCE_SIZE = 12
+GCM_TAG_SIZE = 16
+GCM_ENVELOPE_MARKER = b'\x01'
+
+STREAM_ENVELOPE_MARKER = b'\x02'
+STREAM_NONCE_PREFIX_SIZE = 7
+STREAM_HEADER_FORMAT = '>c16s7sI'
+STREAM_HEADER_SIZE = struct.calcsize(STREAM_HEADER_FORMAT)
+DEFAULT_STREAM_CHUNK_SIZE = 64 * 1024
+
+ENVELOPE_GCM = 'gcm'
+ENVELOPE_FERNET = 'fernet'
+ENVELOPES = (ENVELOPE_GCM, ENVELOPE_FERNET)
+
+
+class KeyCache:
+    # In-process LRU cache of PBKDF2-derived keys, keyed on SHA-256(password) + salt.
+    # Keys live in memory only and expire `ttl` seconds after they were derived.
+    def __init__(self, maxsize: int = 128, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, password: str, salt: bytes) -> Optional[bytes]:
+        cache_key = _password_digest(password) + salt
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[cache_key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            self.seconds_saved += entry[2]
+            return entry[1]
+    
+    def put(self, password: str, salt: bytes, key: bytes, derive_seconds: float = 0.0) -> None:
+        cache_key = _password_digest(password) + salt
+        with self._lock:
+            self._entries[cache_key] = (time.monotonic() + self.ttl, key, derive_seconds)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
     
-    return bytes_data
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
 
-def generate_key_from_password(password: str, salt: bytes) -> bytes:
+_key_cache: Optional[KeyCache] = None
+_sessions = {}
+
+def enable_key_cache(maxsize: int = 128, ttl: float = 300.0) -> KeyCache:
+    global _key_cache
+    _key_cache = KeyCache(maxsize, ttl)
+    return _key_cache
+
+def disable_key_cache() -> None:
+    global _key_cache
+    if _key_cache is not None:
+        _key_cache.clear()
+    _key_cache = None
+
+def get_key_cache() -> Optional[KeyCache]:
+    return _key_cache
+
+@contextmanager
+def key_session(password: str):
+    # Within the block, encryption reuses one salt and derived key for `password` instead of
+    # running PBKDF2 per message. Every message still gets a fresh IV/nonce.
+    digest = _password_digest(password)
+    salt = os.urandom(SALT_SIZE)
+    previous = _sessions.get(digest)
+    _sessions[digest] = (salt, _get_key(password, salt))
+    try:
+        yield
+    finally:
+        if previous is None:
+            _sessions.pop(digest, None)
+        else:
+            _sessions[digest] = previous
+
+def _password_digest(password: str) -> bytes:
+    return hashlib.sha256(password.encode()).digest()
+
+def _derive_key(password: str, salt: bytes) -> bytes:
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
@@ -30,12 +128,34 @@ def generate_key_from_password(password: str, salt: bytes) -> bytes:
         iterations=100_000,
         backend=default_backend()
     )
-    return base64.urlsafe_b64encode(kdf.derive(password.encode()))
+    with profiling.span('crypto.kdf'):
+        return kdf.derive(password.encode())
+
+def _get_key(password: str, salt: bytes) -> bytes:
+    cache = _key_cache
+    if cache is None:
+        return _derive_key(password, salt)
+    
+    key = cache.get(password, salt)
+    if key is None:
+        started = time.perf_counter()
+        key = _derive_key(password, salt)
+        cache.put(password, salt, key, time.perf_counter() - started)
+    return key
+
+def _salt_and_key(password: str):
+    session = _sessions.get(_password_digest(password)) if _sessions else None
+    if session is not None:
+        return session
+    salt = os.urandom(SALT_SIZE)
+    return salt, _get_key(password, salt)
+
+def generate_key_from_password(password: str, salt: bytes) -> bytes:
+    return base64.urlsafe_b64encode(_get_key(password, salt))
 
 def encrypt(message: str, password: str) -> str:
-    salt = os.urandom(16)  
-    key = generate_key_from_password(password, salt)
-    fernet = Fernet(key)
+    salt, key = _salt_and_key(password)
+    fernet = Fernet(base64.urlsafe_b64encode(key))
     encrypted = fernet.encrypt(message.encode())
     return base64.urlsafe_b64encode(salt + encrypted).decode()
 
@@ -51,6 +171,162 @@ def decrypt(encrypted_message: str, password: str) -> str:
     except Exception as e:
         return f"Decryption failed: {str(e)}"
 
+def encrypt_bytes(data: bytes, password: str, envelope: str = ENVELOPE_GCM) -> bytes:
+    # 'gcm':    marker | salt (16) | nonce (12) | AES-256-GCM ciphertext | tag (16), raw bytes.
+    # 'fernet': the base64 text produced by encrypt(), for carriers read by older versions.
+    if envelope == ENVELOPE_FERNET:
+        salt, key = _salt_and_key(password)
+        with profiling.span('crypto.encrypt'):
+            encrypted = Fernet(base64.urlsafe_b64encode(key)).encrypt(data)
+            return base64.urlsafe_b64encode(salt + encrypted)
+    if envelope == ENVELOPE_GCM:
+        salt, key = _salt_and_key(password)
+        nonce = os.urandom(GCM_NONCE_SIZE)
+        with profiling.span('crypto.encrypt'):
+            return GCM_ENVELOPE_MARKER + salt + nonce + AESGCM(key).encrypt(nonce, data, None)
+    raise ValueError(f"Unsupported envelope '{envelope}'. Choose one of: {', '.join(ENVELOPES)}")
+
+def encrypted_size(plaintext_size: int, envelope: str = ENVELOPE_GCM) -> int:
+    # Length of encrypt_bytes() output for `plaintext_size` input bytes, without encrypting anything.
+    if envelope == ENVELOPE_GCM:
+        return len(GCM_ENVELOPE_MARKER) + SALT_SIZE + GCM_NONCE_SIZE + plaintext_size + GCM_TAG_SIZE
+    if envelope == ENVELOPE_FERNET:
+        # Token: version (1) | timestamp (8) | IV (16) | PKCS7-padded ciphertext | HMAC (32), base64-encoded
+        # with the salt prepended and base64-encoded again.
+        token = 4 * -(-(1 + 8 + 16 + (plaintext_size // 16 + 1) * 16 + 32) // 3)
+        return 4 * -(-(SALT_SIZE + token) // 3)
+    raise ValueError(f"Unsupported envelope '{envelope}'. Choose one of: {', '.join(ENVELOPES)}")
+
+def decrypt_bytes(data: bytes, password: str) -> bytes:
+    # Detects the envelope: the GCM marker byte can never start the base64 text of a Fernet envelope.
+    data = bytes(data)
+    if data[:1] == STREAM_ENVELOPE_MARKER:
+        return b''.join(decrypt_stream([data], password))
+    if data[:1] == GCM_ENVELOPE_MARKER:
+        salt = data[1:1 + SALT_SIZE]
+        nonce = data[1 + SALT_SIZE:1 + SALT_SIZE + GCM_NONCE_SIZE]
+        encrypted = data[1 + SALT_SIZE + GCM_NONCE_SIZE:]
+        aead = AESGCM(_get_key(password, salt))
+        with profiling.span('crypto.decrypt'):
+            return aead.decrypt(nonce, encrypted, None)
+    
+    decoded = base64.urlsafe_b64decode(data)
+    salt, encrypted = decoded[:SALT_SIZE], decoded[SALT_SIZE:]
+    fernet = Fernet(generate_key_from_password(password, salt))
+    with profiling.span('crypto.decrypt'):
+        return fernet.decrypt(encrypted)
+
+def decrypt_payload(data, password: str, codec_id: int = 0) -> str:
+    # Same contract as decrypt(): returns the message, or a "Decryption failed" string.
+    # `codec_id` is the compression applied before encryption (see utils.compression).
+    try:
+        if isinstance(data, str):
+            data = data.encode()
+        return decompress_payload(decrypt_bytes(data, password), codec_id).decode()
+    except InvalidTag:
+        return "Decryption failed: authentication tag mismatch (wrong password or corrupted data)"
+    except Exception as e:
+        return f"Decryption failed: {str(e)}"
+
+def stream_ciphertext_size(plaintext_size: int, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> int:
+    records = max(1, -(-plaintext_size // chunk_size))
+    return STREAM_HEADER_SIZE + plaintext_size + records * GCM_TAG_SIZE
+
+def encrypt_stream(source: BinaryIO, password: str, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    # Stream envelope: marker | salt (16) | nonce prefix (7) | chunk size (4), followed by one AES-256-GCM
+    # record per `chunk_size` bytes read from `source`. Record nonces are prefix | counter (4) | last flag (1),
+    # so reordered, dropped or truncated records fail authentication.
+    if not 0 < chunk_size < 1 << 32:
+        raise ValueError("chunk_size must be between 1 and 2**32 - 1 bytes")
+    
+    salt, key = _salt_and_key(password)
+    prefix = os.urandom(STREAM_NONCE_PREFIX_SIZE)
+    aead = AESGCM(key)
+    yield struct.pack(STREAM_HEADER_FORMAT, STREAM_ENVELOPE_MARKER, salt, prefix, chunk_size)
+    
+    chunk = _read_full(source, chunk_size)
+    counter = 0
+    while True:
+        following = _read_full(source, chunk_size)
+        last = not following
+        with profiling.span('crypto.encrypt'):
+            record = aead.encrypt(_stream_nonce(prefix, counter, last), chunk, None)
+        profiling.count('payload_bytes_read', len(chunk))
+        yield record
+        if last:
+            return
+        chunk = following
+        counter += 1
+
+def decrypt_stream(chunks: Iterable[bytes], password: str) -> Iterator[bytes]:
+    # Accepts the stream envelope split at arbitrary boundaries and yields plaintext record by record.
+    # Raises InvalidTag for a wrong password or any tampered, reordered or missing record.
+    chunks = iter(chunks)
+    buffer = bytearray()
+    while len(buffer) < STREAM_HEADER_SIZE:
+        data = next(chunks, None)
+        if data is None:
+            raise ValueError("Stream envelope is truncated")
+        buffer += data
+    
+    marker, salt, prefix, chunk_size = struct.unpack(STREAM_HEADER_FORMAT, buffer[:STREAM_HEADER_SIZE])
+    if marker != STREAM_ENVELOPE_MARKER:
+        raise ValueError("Not a stream envelope")
+    del buffer[:STREAM_HEADER_SIZE]
+    
+    aead = AESGCM(_get_key(password, salt))
+    record_size = chunk_size + GCM_TAG_SIZE
+    counter = 0
+    while True:
+        # A full record is only known not to be the last one once more data follows it.
+        while len(buffer) > record_size:
+            with profiling.span('crypto.decrypt'):
+                plaintext = aead.decrypt(_stream_nonce(prefix, counter, False), bytes(buffer[:record_size]), None)
+            del buffer[:record_size]
+            yield plaintext
+            counter += 1
+        data = next(chunks, None)
+        if data is None:
+            break
+        buffer += data
+    
+    with profiling.span('crypto.decrypt'):
+        plaintext = aead.decrypt(_stream_nonce(prefix, counter, True), bytes(buffer), None)
+    yield plaintext
+
+def decrypt_stream_to_file(chunks: Iterable[bytes], password: str, output_path: str) -> str:
+    # Same contract as decrypt_payload(), for stream envelopes: writes the plaintext to `output_path`
+    # and returns a status line, or a "Decryption failed" string. Nothing is left behind on failure.
+    partial_path = output_path + '.part'
+    try:
+        size = 0
+        with open(partial_path, 'wb') as f:
+            for plaintext in decrypt_stream(chunks, password):
+                f.write(plaintext)
+                size += len(plaintext)
+        os.replace(partial_path, output_path)
+        profiling.count('payload_bytes_written', size)
+        return f"Payload written to {output_path} ({size} bytes)"
+    except InvalidTag:
+        return "Decryption failed: authentication tag mismatch (wrong password or corrupted data)"
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+def _stream_nonce(prefix, counter, last):
+    if counter >= 1 << 32:
+        raise ValueError("Stream has too many records")
+    return prefix + struct.pack('>IB', counter, last)
+
+def _read_full(source, size):
+    data = source.read(size)
+    while data and len(data) < size:
+        more = source.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
 # def encrypt(message: str, password: str) -> str:
 #     key = hashlib.sha256(password.encode()).digest()
 #     message_bytes = message.encode() if isinstance(message, str) else message
@@ -0,0 +1,169 @@
+import struct
+import zlib
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'STG'
+VERSION = 1
+HEADER_FORMAT = '>3sBBBII'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+HEADER_BITS = HEADER_SIZE * 8
+
+METHOD_IMAGE_LSB = 1
+METHOD_IMAGE_DCT = 2
+METHOD_AUDIO_LSB = 3
+METHOD_AUDIO_ECHO = 4
+METHOD_VIDEO_LSB = 5
+
+# Header flag bits; the upper four bits hold the compression codec id (see utils.compression).
+FLAG_STREAM = 0x01
+COMPRESSION_FLAG_SHIFT = 4
+
+STREAM_CHUNK_BITS = 1 << 19
+
+LEGACY_DELIMITER = '1111111111111110'
+
+BitReader = Callable[[int, int], np.ndarray]
+
+
+# Payload bits are np.uint8 arrays holding one 0/1 value per element, most significant bit first.
+
+def bytes_to_bits(data: bytes) -> np.ndarray:
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+def bits_to_bytes(bits: np.ndarray) -> bytes:
+    # A trailing partial byte is zero-padded.
+    return np.packbits(bits).tobytes()
+
+def bits_to_str(bits: np.ndarray) -> str:
+    return (np.asarray(bits, dtype=np.uint8) + ord('0')).tobytes().decode('ascii')
+
+def str_to_bits(binary: str) -> np.ndarray:
+    return np.frombuffer(binary.encode('ascii'), dtype=np.uint8) - ord('0')
+
+def build_container(payload: bytes, method: int, flags: int = 0) -> bytes:
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, method, flags, len(payload), zlib.crc32(payload))
+    return header + payload
+
+def container_bits(payload: bytes, method: int, flags: int = 0) -> np.ndarray:
+    return bytes_to_bits(build_container(payload, method, flags))
+
+def stream_container_bits(chunks: Iterable[bytes], length: int, method: int, flags: int = 0) -> Iterator[np.ndarray]:
+    # Yields the header and then each payload chunk as bits, so the payload is never held whole.
+    # Streamed payloads are authenticated chunk by chunk by their envelope, so the header carries no CRC.
+    yield bytes_to_bits(struct.pack(HEADER_FORMAT, MAGIC, VERSION, method, flags | FLAG_STREAM, length, 0))
+    for chunk in chunks:
+        yield bytes_to_bits(chunk)
+
+def parse_header(header: bytes) -> Optional[Tuple[int, int, int, int]]:
+    if len(header) < HEADER_SIZE:
+        return None
+    magic, version, method, flags, length, checksum = struct.unpack(HEADER_FORMAT, header[:HEADER_SIZE])
+    if magic != MAGIC or version != VERSION:
+        return None
+    return method, flags, length, checksum
+
+def compression_flags(codec_id: int) -> int:
+    return codec_id << COMPRESSION_FLAG_SHIFT
+
+def flags_compression(flags: int) -> int:
+    return flags >> COMPRESSION_FLAG_SHIFT
+
+def read_container_with_flags(read_bits: BitReader, method: int, chunk_bits: int = 4096,
+                              legacy_fallback: bool = True) -> Optional[Tuple[bytes, int]]:
+    # read_bits(start, count) returns up to `count` carrier bits starting at bit `start`;
+    # fewer bits means the carrier ran out. Returns (payload, header flags); legacy payloads have no flags.
+    header = parse_header(bits_to_bytes(read_bits(0, HEADER_BITS)))
+    if header is None:
+        if not legacy_fallback:
+            return None
+        payload = _read_legacy_payload(read_bits, chunk_bits)
+        return None if payload is None else (payload, 0)
+
+    header_method, flags, length, checksum = header
+    if header_method != method:
+        raise ValueError(f"Payload was hidden with a different method (id {header_method})")
+    if flags & FLAG_STREAM:
+        # Checked before the payload is read, since stream payloads may be far larger than any message.
+        raise ValueError("Carrier holds a file payload; extract it with --output-file")
+
+    payload_bits = read_bits(HEADER_BITS, length * 8)
+    if len(payload_bits) < length * 8:
+        raise ValueError("Payload is truncated")
+
+    payload = bits_to_bytes(payload_bits)
+    if zlib.crc32(payload) != checksum:
+        raise ValueError("Payload checksum mismatch")
+    return payload, flags
+
+def read_container_stream(read_bits: BitReader, method: int,
+                          chunk_bits: int = STREAM_CHUNK_BITS) -> Optional[Iterator[bytes]]:
+    # Streaming counterpart of read_container_with_flags() for payloads written by stream_container_bits():
+    # checks the header up front, then returns an iterator over the payload bytes.
+    header = parse_header(bits_to_bytes(read_bits(0, HEADER_BITS)))
+    if header is None:
+        return None
+    
+    header_method, flags, length, _ = header
+    if header_method != method:
+        raise ValueError(f"Payload was hidden with a different method (id {header_method})")
+    if not flags & FLAG_STREAM:
+        raise ValueError("Payload was not hidden as a stream")
+    
+    return _iter_stream_payload(read_bits, length * 8, max(8, chunk_bits - chunk_bits % 8))
+
+def _iter_stream_payload(read_bits, total_bits, chunk_bits):
+    position = 0
+    while position < total_bits:
+        count = min(chunk_bits, total_bits - position)
+        bits = read_bits(HEADER_BITS + position, count)
+        if len(bits) < count:
+            raise ValueError("Payload is truncated")
+        yield bits_to_bytes(bits)
+        position += count
+
+class StreamBitReader:
+    # Adapts an iterator of bit chunks to the read_bits(start, count) interface.
+    # Reads must move forward; chunks are only pulled as far as the last request.
+    def __init__(self, chunks: Iterable[np.ndarray]):
+        self._chunks = iter(chunks)
+        self._pending = np.zeros(0, dtype=np.uint8)
+        self._offset = 0
+
+    def __call__(self, start: int, count: int) -> np.ndarray:
+        if start < self._offset:
+            raise ValueError("StreamBitReader cannot seek backwards")
+
+        parts = [self._pending]
+        available = self._offset + len(self._pending)
+        while available < start + count:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            available += len(chunk)
+
+        pending = np.concatenate(parts) if len(parts) > 1 else self._pending
+        pending = pending[start - self._offset:]
+        self._offset = start
+
+        bits = pending[:count]
+        self._pending = pending
+        return bits
+
+def _read_legacy_payload(read_bits: BitReader, chunk_bits: int) -> Optional[bytes]:
+    delimiter = LEGACY_DELIMITER.encode()
+    stream = bytearray()
+
+    while True:
+        chunk = read_bits(len(stream), chunk_bits)
+        if len(chunk) == 0:
+            return None
+
+        search_from = max(0, len(stream) - len(delimiter) + 1)
+        stream += bits_to_str(chunk).encode('ascii')
+
+        pos = stream.find(delimiter, search_from)
+        if pos >= 0:
+            return bits_to_bytes(str_to_bits(stream[:pos].decode('ascii')))
@@ -0,0 +1,270 @@
+import io
+import os
+import struct
+import zlib
+from typing import Optional
+
+import numpy as np
+
+# Row-band PNG reading and writing, so large images never have to be decoded or encoded whole.
+# The reader inflates the IDAT stream incrementally and unfilters each band with Pillow by wrapping
+# it, plus the raw row above it, in a small stand-alone PNG. The writer filters rows itself
+# (adaptive per-row filter choice, as libpng does) and deflates them as one continuous stream.
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+PNG_GRAY = 0
+PNG_RGB = 2
+PNG_PALETTE = 3
+PNG_GRAY_ALPHA = 4
+PNG_RGBA = 6
+PNG_CHANNELS = {PNG_GRAY: 1, PNG_RGB: 3, PNG_PALETTE: 1, PNG_GRAY_ALPHA: 2, PNG_RGBA: 4}
+
+IDAT_READ_SIZE = 1 << 20
+
+# Colour, physical-size and text chunks before the image data, which the writer carries over to its RGB
+# output. PLTE, tRNS and other chunks tied to the source's colour type are not.
+PNG_METADATA_CHUNKS = (b'iCCP', b'sRGB', b'gAMA', b'cHRM', b'pHYs', b'tEXt', b'zTXt', b'iTXt')
+
+
+def open_png_strips(path: str) -> Optional["PngStripReader"]:
+    # Returns None for files this reader cannot stream (not PNG, interlaced, or not 8 bits per sample);
+    # callers fall back to decoding those whole.
+    with open(path, 'rb') as f:
+        if f.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+            return None
+    reader = PngStripReader(path)
+    if reader.interlaced or reader.bit_depth != 8 or reader.color_type not in PNG_CHANNELS:
+        reader.close()
+        return None
+    return reader
+
+def png_size(path: str) -> Optional[tuple]:
+    # (width, height) from the IHDR chunk, or None if the file is not a PNG.
+    with open(path, 'rb') as f:
+        header = f.read(len(PNG_SIGNATURE) + 8 + 8)
+    if header[:len(PNG_SIGNATURE)] != PNG_SIGNATURE or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+def png_metadata_from_info(info: dict, text: Optional[dict] = None) -> list:
+    # Metadata chunks for PngStripWriter from a decoded Pillow image: its ICC profile and dpi from `info`,
+    # and, for PNG sources, their text chunks from `text`.
+    chunks = []
+    if info.get('icc_profile'):
+        chunks.append((b'iCCP', b'ICC Profile\x00\x00' + zlib.compress(info['icc_profile'])))
+    dpi = info.get('dpi')
+    if dpi and min(dpi) > 0:
+        chunks.append((b'pHYs', struct.pack('>IIB', int(dpi[0] / 0.0254 + 0.5), int(dpi[1] / 0.0254 + 0.5), 1)))
+    for key, value in (text or {}).items():
+        try:
+            chunks.append((b'tEXt', key.encode('latin-1') + b'\x00' + value.encode('latin-1')))
+        except UnicodeEncodeError:
+            chunks.append((b'iTXt', key.encode('utf-8') + b'\x00\x00\x00\x00\x00' + value.encode('utf-8')))
+    return chunks
+
+class PngStripReader:
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        try:
+            self._read_header()
+        except Exception:
+            self._file.close()
+            raise
+        self.row_bytes = 1 + self.width * PNG_CHANNELS.get(self.color_type, 0)
+        self._idat = self._iter_idat()
+        self._inflater = zlib.decompressobj()
+        self._pending = bytearray()
+        # Raw bytes of the last row handed out; the next band's filters refer to it.
+        self._previous_row = bytes(self.row_bytes - 1)
+        self.rows_read = 0
+
+    def _read_header(self):
+        if self._file.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+            raise ValueError("Not a PNG file")
+        self._ancillary = []
+        self.metadata = []
+        while True:
+            chunk_type, data = self._read_chunk_header()
+            if chunk_type == b'IDAT':
+                self._idat_remaining = data
+                return
+            if chunk_type == b'IEND':
+                raise ValueError("PNG file has no image data")
+            payload = self._file.read(data)
+            self._file.read(4)
+            if chunk_type == b'IHDR':
+                (self.width, self.height, self.bit_depth, self.color_type,
+                 _, _, interlace) = struct.unpack('>IIBBBBB', payload)
+                self.interlaced = interlace != 0
+            elif chunk_type in (b'PLTE', b'tRNS'):
+                self._ancillary.append((chunk_type, payload))
+            elif chunk_type in PNG_METADATA_CHUNKS:
+                self.metadata.append((chunk_type, payload))
+
+    def _read_chunk_header(self):
+        header = self._file.read(8)
+        if len(header) < 8:
+            raise ValueError("PNG file is truncated")
+        length, chunk_type = struct.unpack('>I4s', header)
+        return chunk_type, length
+
+    def _iter_idat(self):
+        # Yields the compressed image data across consecutive IDAT chunks, in bounded pieces.
+        remaining = self._idat_remaining
+        while True:
+            while remaining:
+                data = self._file.read(min(remaining, IDAT_READ_SIZE))
+                if not data:
+                    raise ValueError("PNG file is truncated")
+                remaining -= len(data)
+                yield data
+            self._file.read(4)
+            chunk_type, remaining = self._read_chunk_header()
+            if chunk_type != b'IDAT':
+                return
+
+    def read_filtered(self, rows: int) -> bytes:
+        # The next `rows` rows exactly as stored: one filter-type byte followed by the filtered row.
+        # Rows read this way are never unfiltered, so read_rows() cannot follow.
+        data = self._inflate(rows * self.row_bytes)
+        self._previous_row = None
+        self.rows_read += rows
+        return data
+
+    def read_rows(self, rows: int) -> np.ndarray:
+        # The next `rows` rows as a writable (rows, width, 3) RGB array.
+        from PIL import Image
+
+        if self._previous_row is None:
+            raise ValueError("Rows after read_filtered() cannot be decoded")
+        filtered = self._inflate(rows * self.row_bytes)
+
+        # A leading unfiltered copy of the previous raw row gives Up/Average/Paeth filters their context.
+        chunks = [(b'IHDR', struct.pack('>IIBBBBB', self.width, rows + 1, 8, self.color_type, 0, 0, 0)),
+                  *self._ancillary,
+                  (b'IDAT', zlib.compress(b'\x00' + self._previous_row + filtered, 0)),
+                  (b'IEND', b'')]
+        band = Image.open(io.BytesIO(PNG_SIGNATURE + b''.join(_chunk(*chunk) for chunk in chunks)))
+        band.load()
+
+        raw = np.asarray(band)
+        self._previous_row = raw[-1].tobytes()
+        self.rows_read += rows
+        if self.color_type == PNG_RGB:
+            return raw[1:].copy()
+        return np.array(band.convert('RGB'))[1:]
+
+    def _inflate(self, size):
+        if self.rows_read * self.row_bytes + size > self.height * self.row_bytes:
+            raise ValueError("Read past the last row of the image")
+        while len(self._pending) < size:
+            data = self._inflater.unconsumed_tail or next(self._idat, None)
+            if data is None:
+                raise ValueError("PNG image data is truncated")
+            self._pending += self._inflater.decompress(data, size - len(self._pending))
+        data = bytes(self._pending[:size])
+        del self._pending[:size]
+        return data
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+class PngStripWriter:
+    # Writes an 8-bit RGB PNG band by band. The file appears at `path` only once every row has been
+    # written; until then it is `path`.part, which is removed if writing fails. `metadata` holds
+    # (chunk type, data) pairs, e.g. PngStripReader.metadata, written ahead of the image data.
+    def __init__(self, path: str, width: int, height: int, compress_level: int = 6, metadata=()):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._partial_path = path + '.part'
+        self._file = open(self._partial_path, 'wb')
+        self._file.write(PNG_SIGNATURE + _chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, PNG_RGB, 0, 0, 0)))
+        self._file.write(b''.join(_chunk(*chunk) for chunk in metadata))
+        self._deflater = zlib.compressobj(compress_level)
+        self._previous_row = np.zeros(width * 3, dtype=np.uint8)
+
+    def write_rows(self, rgb: np.ndarray) -> None:
+        raw = np.ascontiguousarray(rgb, dtype=np.uint8).reshape(len(rgb), self.width * 3)
+        filtered = _filter_rows(raw, self._previous_row)
+        self._previous_row = raw[-1].copy()
+        self._write_compressed(filtered, len(raw))
+
+    def write_filtered(self, data: bytes, rows: int) -> None:
+        # Rows straight from PngStripReader.read_filtered(); their filters must refer to unchanged rows.
+        self._previous_row = None
+        self._write_compressed(data, rows)
+
+    def _write_compressed(self, data, rows):
+        self.rows_written += rows
+        if self.rows_written > self.height:
+            raise ValueError("More rows written than the image has")
+        self._write_idat(self._deflater.compress(data))
+
+    def _write_idat(self, data):
+        if data:
+            self._file.write(_chunk(b'IDAT', data))
+
+    def close(self) -> None:
+        if self.rows_written != self.height:
+            raise ValueError(f"Only {self.rows_written} of {self.height} rows were written")
+        self._write_idat(self._deflater.flush())
+        self._file.write(_chunk(b'IEND', b''))
+        self._file.close()
+        os.replace(self._partial_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._partial_path)
+        return False
+
+def _chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+def _filter_rows(raw, previous_row, bpp=3):
+    # Tries all five PNG filters on every row and keeps, per row, the one with the smallest sum of
+    # absolute (signed) values, the heuristic libpng uses. Returns rows prefixed with their filter type.
+    rows, stride = raw.shape
+    current = raw.astype(np.int16)
+    up = np.empty_like(current)
+    up[0] = previous_row
+    up[1:] = current[:-1]
+    left = np.zeros_like(current)
+    left[:, bpp:] = current[:, :-bpp]
+    up_left = np.zeros_like(current)
+    up_left[:, bpp:] = up[:, :-bpp]
+
+    estimate = left + up - up_left
+    distance_left, distance_up, distance_up_left = np.abs(estimate - left), np.abs(estimate - up), np.abs(estimate - up_left)
+    paeth = np.where((distance_left <= distance_up) & (distance_left <= distance_up_left), left,
+                     np.where(distance_up <= distance_up_left, up, up_left))
+
+    best = np.empty((rows, stride + 1), dtype=np.uint8)
+    best_score = None
+    for filter_type, predictor in enumerate((None, left, up, (left + up) >> 1, paeth)):
+        candidate = (current if predictor is None else current - predictor).astype(np.uint8)
+        score = np.abs(candidate.view(np.int8).astype(np.int32)).sum(axis=1)
+        if best_score is None:
+            chosen = np.ones(rows, dtype=bool)
+            best_score = score
+        else:
+            chosen = score < best_score
+            best_score = np.where(chosen, score, best_score)
+        best[chosen, 0] = filter_type
+        best[chosen, 1:] = candidate[chosen]
+    return best
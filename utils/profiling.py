@@ -0,0 +1,126 @@
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Stage timings and counters for hide/extract runs. Instrumented code calls span() and count();
+# while profiling is disabled both return immediately, so the calls can stay in hot paths.
+# Spans with the same name accumulate, and nested spans are inclusive (crypto.decrypt contains crypto.kdf).
+
+
+class Profile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, list] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, name: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(name, [0, 0.0])
+            stage[0] += calls
+            stage[1] += seconds
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                'total_seconds': time.perf_counter() - self.started,
+                'stages': {name: {'calls': calls, 'seconds': seconds}
+                           for name, (calls, seconds) in sorted(self.stages.items())},
+                'counters': dict(sorted(self.counters.items())),
+                'peak_rss_mb': peak_rss_mb(),
+            }
+
+class _Span:
+    __slots__ = ('profile', 'name', 'started')
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+_profile: Optional[Profile] = None
+
+def enable_profiling() -> Profile:
+    global _profile
+    _profile = Profile()
+    return _profile
+
+def disable_profiling() -> Optional[Profile]:
+    global _profile
+    profile, _profile = _profile, None
+    return profile
+
+def get_profile() -> Optional[Profile]:
+    return _profile
+
+@contextmanager
+def profiling():
+    # Library hook: profiles the block and yields the Profile, e.g.
+    #   with profiling() as profile:
+    #       hide_message_in_image_lsb(...)
+    #   report = profile.as_dict()
+    profile = enable_profiling()
+    try:
+        yield profile
+    finally:
+        disable_profiling()
+
+def span(name: str):
+    profile = _profile
+    if profile is None:
+        return _NULL_SPAN
+    return _Span(profile, name)
+
+def count(name: str, value: int = 1) -> None:
+    profile = _profile
+    if profile is not None:
+        profile.count(name, value)
+
+def count_file_size(name: str, path: str) -> None:
+    # Only stats the file while profiling is enabled.
+    profile = _profile
+    if profile is not None and os.path.exists(path):
+        profile.count(name, os.path.getsize(path))
+
+def add_time(name: str, seconds: float, calls: int = 1) -> None:
+    profile = _profile
+    if profile is not None:
+        profile.add_time(name, seconds, calls)
+
+def peak_rss_mb() -> float:
+    # VmHWM belongs to the current address space; Linux carries ru_maxrss across fork and exec,
+    # so a spawned process would otherwise report its parent's peak.
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
@@ -0,0 +1,114 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, NamedTuple, Optional
+from utils.payload import HEADER_BITS, bits_to_bytes, parse_header
+
+# Progress reporting and cancellation for hide/extract entry points, which accept
+#   progress: callable receiving ProgressEvent, called at most every PROGRESS_INTERVAL seconds and once at the end
+#   cancel:   CancelToken checked between frames, chunks or stages
+# Units depend on the carrier: frames for video, samples for streamed audio, and processing steps
+# (decode, embed, encode) where the work is one vectorised pass over the whole carrier.
+
+PROGRESS_INTERVAL = 0.2
+
+
+class JobCancelled(BaseException):
+    # Derives from BaseException, like asyncio.CancelledError, so that handlers turning errors into
+    # "Failed to extract message" results do not swallow it. Cleanup runs in the usual finally blocks.
+    pass
+
+class CancelToken:
+    # Thread-safe; cancel() may be called from any thread, e.g. a scheduler's watchdog.
+    # `event` may be a multiprocessing.Event to share the token with worker processes.
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise JobCancelled("Job was cancelled")
+
+class ProgressEvent(NamedTuple):
+    done: int
+    total: Optional[int]      # None until known, e.g. before an extractor has read the payload header
+    unit: str
+    elapsed: float            # seconds
+    rate: float               # units per second
+    eta: Optional[float]      # seconds remaining, None when the total or rate is unknown
+
+ProgressCallback = Callable[[ProgressEvent], None]
+
+class Progress:
+    def __init__(self, callback: Optional[ProgressCallback] = None,
+                 cancel: Optional[CancelToken] = None, total: Optional[int] = None, unit: str = 'steps'):
+        self.callback = callback
+        self.cancel = cancel
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self._started = time.perf_counter()
+        self._reported = self._started
+
+    def advance(self, units: int = 1) -> None:
+        self.update(self.done + units)
+
+    def update(self, done: int) -> None:
+        # Records `done` units and raises JobCancelled if the job was cancelled.
+        self.done = done
+        if self.cancel is not None:
+            self.cancel.raise_if_cancelled()
+        if self.callback is not None:
+            now = time.perf_counter()
+            if now - self._reported >= PROGRESS_INTERVAL:
+                self._reported = now
+                self.callback(self.event(now))
+
+    def check(self) -> None:
+        if self.cancel is not None:
+            self.cancel.raise_if_cancelled()
+
+    def finish(self) -> None:
+        if self.total is not None:
+            self.done = self.total
+        if self.callback is not None:
+            self.callback(self.event(time.perf_counter()))
+
+    def event(self, now: float) -> ProgressEvent:
+        elapsed = now - self._started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = max(self.total - self.done, 0) / rate
+        return ProgressEvent(self.done, self.total, self.unit, elapsed, rate, eta)
+
+def track_bits(read_bits, progress: Progress, bits_per_unit: int = 1):
+    # Wraps a read_bits(start, count) reader so reads advance `progress` in carrier units. The total
+    # is taken from the payload header on the first read; containers without one keep it unknown.
+    def tracked(start, count):
+        bits = read_bits(start, count)
+        if progress.total is None and start == 0 and len(bits) >= HEADER_BITS:
+            header = parse_header(bits_to_bytes(bits[:HEADER_BITS]))
+            if header is not None:
+                progress.total = math.ceil((HEADER_BITS + header[2] * 8) / bits_per_unit)
+        progress.update(math.ceil((start + len(bits)) / bits_per_unit))
+        return bits
+    return tracked
+
+@contextmanager
+def removing_on_cancel(path: str):
+    # Deletes a partly written output file if the job is cancelled while writing it.
+    try:
+        yield
+    except JobCancelled:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
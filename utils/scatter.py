@@ -0,0 +1,97 @@
+import hashlib
+import struct
+from typing import Callable, Tuple
+
+import numpy as np
+from utils.crypto import generate_key_from_password
+
+# Password-keyed scattering of payload bits over a carrier's slots (pixel channels, DCT blocks,
+# samples or frame LSBs). Container bit i goes to slot permutation(i), where the permutation is a
+# keyed Feistel network over the smallest power-of-two domain covering the slots, with cycle
+# walking to stay inside it. Positions are computed only for the bits being placed or read,
+# so the cost follows the payload rather than the carrier, and callers touch slots in sorted order.
+
+# Scatter positions must be recoverable from the password alone, before any salt could be read from
+# the carrier, so the key is derived with a fixed salt. It goes through the same PBKDF2 and key cache
+# as the envelope keys.
+SCATTER_SALT = b'stego-scatter/v1'
+FEISTEL_ROUNDS = 6
+
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def scatter_key(password: str) -> bytes:
+    return generate_key_from_password(password, SCATTER_SALT)
+
+class ScatterPermutation:
+    def __init__(self, key: bytes, size: int):
+        self.size = size
+        # Halves of uneven width swap places every round (an even number of them), so the domain is the
+        # smallest power of two covering the slots and cycle walking averages under two encryptions.
+        domain_bits = max(2, (size - 1).bit_length())
+        self._widths = ((domain_bits + 1) // 2, domain_bits // 2)
+        # Round keys also depend on the slot count, so carriers of different sizes get unrelated layouts.
+        self._round_keys = [np.uint64(int.from_bytes(hashlib.sha256(key + struct.pack('>QB', size, index)).digest()[:8], 'big'))
+                            for index in range(FEISTEL_ROUNDS)]
+
+    def positions(self, start: int, count: int) -> np.ndarray:
+        # Slots of container bits [start, start + count), in bit order.
+        return self(np.arange(start, start + count, dtype=np.uint64))
+
+    def __call__(self, indices: np.ndarray) -> np.ndarray:
+        positions = self._encrypt(np.asarray(indices, dtype=np.uint64))
+        # Cycle walking: re-encrypt values that land outside the slots until they fall inside.
+        outside = np.flatnonzero(positions >= self.size)
+        while len(outside):
+            positions[outside] = self._encrypt(positions[outside])
+            outside = outside[positions[outside] >= self.size]
+        return positions.astype(np.int64)
+
+    def _encrypt(self, values):
+        left_bits, right_bits = self._widths
+        left, right = values >> np.uint64(right_bits), values & np.uint64((1 << right_bits) - 1)
+        for round_key in self._round_keys:
+            left, right = right, left ^ (_mix(right, round_key) & np.uint64((1 << left_bits) - 1))
+            left_bits, right_bits = right_bits, left_bits
+        return (left << np.uint64(right_bits)) | right
+
+def _mix(value, round_key):
+    # splitmix64 finaliser over the keyed half; NumPy's uint64 arithmetic wraps as intended.
+    mixed = (value ^ round_key) * _MIX_1
+    mixed ^= mixed >> np.uint64(31)
+    mixed *= _MIX_2
+    mixed ^= mixed >> np.uint64(29)
+    return mixed
+
+def scatter_layout(bits: np.ndarray, permutation: ScatterPermutation) -> Tuple[np.ndarray, np.ndarray]:
+    # Slots for all of `bits`, sorted ascending, with the bits reordered to match, so embedding
+    # walks the carrier front to back.
+    if len(bits) > permutation.size:
+        raise ValueError("Payload is larger than the carrier")
+    positions = permutation.positions(0, len(bits))
+    order = np.argsort(positions)
+    return positions[order], bits[order]
+
+def band_slice(positions: np.ndarray, start: int, stop: int) -> slice:
+    # The run of sorted `positions` that falls in slots [start, stop).
+    low, high = np.searchsorted(positions, (start, stop))
+    return slice(int(low), int(high))
+
+class ScatterBitReader:
+    # read_bits(start, count) over scattered slots. gather(sorted_positions) returns the carrier bits at
+    # those slots, in the same order, or fewer if the carrier ran out.
+    def __init__(self, gather: Callable[[np.ndarray], np.ndarray], permutation: ScatterPermutation):
+        self._gather = gather
+        self._permutation = permutation
+
+    def __call__(self, start: int, count: int) -> np.ndarray:
+        count = max(0, min(count, self._permutation.size - start))
+        positions = self._permutation.positions(start, count)
+        order = np.argsort(positions)
+        values = self._gather(positions[order])
+        if len(values) < count:
+            return np.zeros(0, dtype=np.uint8)
+        bits = np.empty(count, dtype=np.uint8)
+        bits[order] = values
+        return bits